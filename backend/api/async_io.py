@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+# Dedicated pool for blocking raster/file reads, separate from Starlette's
+# default threadpool, so a burst of map clicks cannot starve other routes
+IO_WORKERS = 8
+
+# Jobs queued or running on the pool before new ones are turned away
+# with 503 (keeps queueing delay, and so tail latency, bounded)
+MAX_PENDING = 256
+
+io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="raster-io")
+
+_pending = 0
+_pending_lock = threading.Lock()
+
+
+async def run_io(fn, *args):
+    # Run fn(*args) on the I/O pool and await its result
+    global _pending
+    with _pending_lock:
+        if _pending >= MAX_PENDING:
+            raise HTTPException(status_code=503, detail="Server busy; retry shortly")
+        _pending += 1
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(io_executor, fn, *args)
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+class CoalescingCache:
+    # Results keyed by request parameters. Concurrent calls with the same
+    # key share one in-flight computation; finished results are kept for
+    # `ttl` seconds (LRU-bounded to `maxsize`), after which the next call
+    # recomputes and so picks up regenerated rasters. Errors are shared
+    # with the waiters of that computation but not cached.
+    def __init__(self, ttl=30.0, maxsize=1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._results = OrderedDict()
+        self._inflight = {}
+        # hits include lookups that joined an in-flight computation
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key, fn, *args):
+        entry = self._results.get(key)
+        if entry is not None:
+            expires, value = entry
+            if time.monotonic() < expires:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._results[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._compute(key, fn, *args))
+            self._inflight[key] = task
+        else:
+            self.hits += 1
+            self.coalesced += 1
+
+        # shield: a client disconnecting must not cancel the computation
+        # the other waiters are sharing
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, fn, *args):
+        try:
+            value = await run_io(fn, *args)
+        finally:
+            self._inflight.pop(key, None)
+
+        self._results[key] = (time.monotonic() + self.ttl, value)
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return value
@@ -0,0 +1,127 @@
+import json
+import math
+import os
+import threading
+
+import numpy as np
+from fastapi import HTTPException
+from rasterio.transform import Affine
+from rasterio.warp import transform_bounds
+
+from backend.api.pixel import raster_store
+from backend.api.zonal import NUM_CODES, RASTER_CRS, YEAR_FROM, YEAR_TO
+
+
+class CountTable:
+    # Summed-area table of per-cell (from, to) transition counts written by
+    # pipeline/compute_change.py, memory-mapped and reloaded when the file
+    # changes. Counts over any pixel rectangle are the table lookups for
+    # the whole cells inside it plus a scan of the partial-cell margins.
+    def __init__(self, path, meta_path):
+        self.path = path
+        self.meta_path = meta_path
+        self._signature = None
+        self._table = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return self._table
+
+        with self._lock:
+            if signature != self._signature:
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                meta["sat"] = np.load(self.path, mmap_mode="r")
+                meta["transform"] = Affine(*meta["transform"])
+                self._table = meta
+                self._signature = signature
+        return self._table
+
+
+def _pixel_histogram(lulc_from, lulc_to, rows, cols):
+    a = lulc_from.array[rows, cols].ravel()
+    b = lulc_to.array[rows, cols].ravel()
+    codes = (
+        np.where(a < NUM_CODES, a, 0).astype(np.intp) * NUM_CODES
+        + np.where(b < NUM_CODES, b, 0)
+    )
+    return np.bincount(codes, minlength=NUM_CODES * NUM_CODES)
+
+
+def rect_histogram(table, lulc_from, lulc_to, row0, row1, col0, col1):
+    # Joint (from, to) histogram of pixel rows [row0, row1) × cols [col0, col1)
+    size = table["block_size"]
+    sat = table["sat"]
+
+    # Whole cells inside the rectangle
+    br0, br1 = -(-row0 // size), row1 // size
+    bc0, bc1 = -(-col0 // size), col1 // size
+    if br0 >= br1 or bc0 >= bc1:
+        return _pixel_histogram(lulc_from, lulc_to, slice(row0, row1), slice(col0, col1))
+
+    hist = (
+        sat[br1, bc1].astype(np.int64) - sat[br0, bc1] - sat[br1, bc0] + sat[br0, bc0]
+    )
+
+    # Partial-cell margins: full-width strips above/below, then the
+    # left/right strips beside the whole cells
+    r0, r1 = br0 * size, br1 * size
+    c0, c1 = bc0 * size, bc1 * size
+    for rows, cols in (
+        (slice(row0, r0), slice(col0, col1)),
+        (slice(r1, row1), slice(col0, col1)),
+        (slice(r0, r1), slice(col0, c0)),
+        (slice(r0, r1), slice(c1, col1)),
+    ):
+        if rows.stop > rows.start and cols.stop > cols.start:
+            hist += _pixel_histogram(lulc_from, lulc_to, rows, cols)
+
+    return hist
+
+
+def bbox_histogram(table, bbox):
+    # bbox = "min_lon,min_lat,max_lon,max_lat"; pixels whose centres fall
+    # in its projected envelope
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=422, detail="bbox must be min_lon,min_lat,max_lon,max_lat"
+        )
+    # nan passes float() and fails every comparison, so check it first
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise HTTPException(status_code=422, detail="bbox values must be finite numbers")
+    if west >= east or south >= north:
+        raise HTTPException(status_code=422, detail="bbox is empty")
+
+    lulc_from = raster_store.get(f"lulc_{YEAR_FROM}")
+    lulc_to = raster_store.get(f"lulc_{YEAR_TO}")
+    height, width = lulc_from.array.shape
+    if (
+        (table["height"], table["width"]) != (height, width)
+        or lulc_to.array.shape != (height, width)
+        or table["transform"] != lulc_from.transform
+    ):
+        raise HTTPException(
+            status_code=409, detail="Count table is out of date; rerun compute_change.py"
+        )
+
+    left, bottom, right, top = transform_bounds("EPSG:4326", RASTER_CRS, west, south, east, north)
+    # Latitudes beyond ±90 project to inf
+    if not all(math.isfinite(v) for v in (left, bottom, right, top)):
+        raise HTTPException(status_code=422, detail="bbox is outside the valid lat/lon range")
+    col_min, row_min = lulc_from.inverse * (left, top)
+    col_max, row_max = lulc_from.inverse * (right, bottom)
+
+    row0 = min(max(0, math.ceil(row_min - 0.5)), height)
+    row1 = min(max(0, math.ceil(row_max - 0.5)), height)
+    col0 = min(max(0, math.ceil(col_min - 0.5)), width)
+    col1 = min(max(0, math.ceil(col_max - 0.5)), width)
+    if row0 >= row1 or col0 >= col1:
+        return np.zeros((NUM_CODES, NUM_CODES), dtype=np.int64)
+
+    hist = rect_histogram(table, lulc_from, lulc_to, row0, row1, col0, col1)
+    return hist.reshape(NUM_CODES, NUM_CODES)
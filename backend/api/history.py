@@ -0,0 +1,103 @@
+import json
+import math
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from rasterio.transform import Affine
+
+from backend.api.async_io import CoalescingCache
+from backend.api.pixel import LULC_CLASSES, transformer
+
+router = APIRouter()
+
+# Built by pipeline/history_store.py
+HISTORY_DIR = Path("data/processed/timeseries/history")
+HISTORY_PATH = HISTORY_DIR / "history.npy"
+HISTORY_META_PATH = HISTORY_DIR / "history.json"
+
+
+class HistoryStore:
+    # Chunked (chunk_rows, chunk_cols, C, C, n_years) array of per-pixel
+    # class/confidence records, memory-mapped and reloaded when the file
+    # changes. A pixel's series for every year is one contiguous record run.
+    def __init__(self, path, meta_path):
+        self.path = path
+        self.meta_path = meta_path
+        self._signature = None
+        self._store = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            return self._store
+
+        with self._lock:
+            if signature != self._signature:
+                with open(self.meta_path) as f:
+                    meta = json.load(f)
+                meta["array"] = np.load(self.path, mmap_mode="r")
+                meta["inverse"] = ~Affine(*meta["transform"])
+                if meta["array"].shape[-1] != len(meta["years"]):
+                    raise HTTPException(
+                        status_code=409,
+                        detail="History store is being rebuilt; retry shortly"
+                    )
+                self._store = meta
+                self._signature = signature
+        return self._store
+
+
+history_store = HistoryStore(HISTORY_PATH, HISTORY_META_PATH)
+history_cache = CoalescingCache(ttl=10.0)
+
+
+def pixel_history(store, row, col):
+    # One chunk lookup; the copy is the only read from disk
+    size = store["chunk_size"]
+    chunk_row, r = divmod(row, size)
+    chunk_col, c = divmod(col, size)
+    records = np.array(store["array"][chunk_row, chunk_col, r, c])
+
+    history = []
+    for year, (class_id, confidence) in zip(store["years"], records.tolist()):
+        if class_id == 0:
+            history.append({"year": year, "class_name": "No Data"})
+        else:
+            history.append({
+                "year": year,
+                "class_id": class_id,
+                "class_name": LULC_CLASSES.get(class_id, "Unknown"),
+                "confidence": float(confidence)
+            })
+    return history
+
+
+def query_history(lat, lon):
+    try:
+        store = history_store.get()
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404, detail="History store not built; run pipeline/history_store.py"
+        )
+
+    x, y = transformer.transform(lon, lat)
+    col, row = store["inverse"] * (x, y)
+
+    # pyproj returns inf for points it cannot transform
+    if math.isfinite(row) and math.isfinite(col) \
+            and 0 <= row < store["height"] and 0 <= col < store["width"]:
+        history = pixel_history(store, math.floor(row), math.floor(col))
+    else:
+        history = [{"year": year, "class_name": "No Data"} for year in store["years"]]
+
+    return {"lat": lat, "lon": lon, "years": store["years"], "history": history}
+
+
+@router.get("/pixel/history")
+async def get_pixel_history(lat: float, lon: float):
+    return await history_cache.get(("history", lat, lon), query_history, lat, lon)
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional: br responses are skipped without it
+    brotli = None
+
+
+class CachedPayload:
+    def __init__(self, data, body, mtime):
+        self.data = data
+        self.body = body
+        self.mtime = int(mtime)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+
+        # Pre-compressed once per file version
+        self.encoded = {"gzip": gzip.compress(body, compresslevel=9)}
+        if brotli is not None:
+            self.encoded["br"] = brotli.compress(body, quality=11)
+
+
+class CachedJSONFile:
+    # Parsed + serialized + compressed JSON file, rebuilt only when the
+    # file's mtime/size changes. The ETag is a content hash, so rewriting
+    # identical content still revalidates to 304.
+    def __init__(self, path):
+        self.path = path
+        self._signature = None
+        self._payload = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self):
+        st = os.stat(self.path)
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature == self._signature:
+            self.hits += 1
+            return self._payload
+
+        with self._lock:
+            if signature != self._signature:
+                self.misses += 1
+                with open(self.path, "rb") as f:
+                    data = json.loads(f.read())
+                # Same serialization as FastAPI's default JSONResponse
+                body = json.dumps(
+                    data,
+                    ensure_ascii=False,
+                    allow_nan=False,
+                    indent=None,
+                    separators=(",", ":")
+                ).encode("utf-8")
+                self._payload = CachedPayload(data, body, st.st_mtime)
+                self._signature = signature
+        return self._payload
+
+
+def _accepted_encodings(request):
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _not_modified(request, payload):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or any(
+            (t[2:] if t.startswith("W/") else t) == payload.etag for t in tags
+        )
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return payload.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def cached_json_response(request: Request, cache: CachedJSONFile):
+    payload = cache.get()
+
+    headers = {
+        "ETag": payload.etag,
+        "Last-Modified": payload.last_modified,
+        # Clients may store the payload but must revalidate (cheap 304)
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    if _not_modified(request, payload):
+        return Response(status_code=304, headers=headers)
+
+    accepted = _accepted_encodings(request)
+    for coding in ("br", "gzip"):
+        if coding in accepted and coding in payload.encoded:
+            headers["Content-Encoding"] = coding
+            return Response(
+                payload.encoded[coding],
+                media_type="application/json",
+                headers=headers
+            )
+
+    return Response(payload.body, media_type="application/json", headers=headers)
@@ -0,0 +1,128 @@
+import threading
+from bisect import bisect_left
+
+from fastapi import APIRouter, Response
+
+from backend.api.history import history_cache
+from backend.api.pixel import pixel_cache
+from backend.api.stats import summary_cache, transition_matrix_cache, viewport_cache
+from backend.api.tiles import tile_cache
+
+router = APIRouter()
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Caches with hits/misses counters, reported as cache_* series
+CACHES = {
+    "pixel": pixel_cache,
+    "pixel_history": history_cache,
+    "viewport_stats": viewport_cache,
+    "summary_json": summary_cache,
+    "transition_matrix_json": transition_matrix_cache,
+    "tiles": tile_cache,
+}
+
+
+class LatencyHistogram:
+    # Per-route request latency, Prometheus histogram semantics
+    # (cumulative buckets, _sum and _count), plus per-status counts
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._statuses = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds):
+        key = (route, method)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+
+            status_key = (route, method, status)
+            self._statuses[status_key] = self._statuses.get(status_key, 0) + 1
+
+    def render(self):
+        lines = [
+            "# HELP http_request_duration_seconds Request latency by route",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            series = {key: (list(counts), total) for key, (counts, total) in self._series.items()}
+            statuses = dict(self._statuses)
+
+        for (route, method), (counts, total) in sorted(series.items()):
+            labels = f'route="{route}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP http_requests_total Requests by route and status",
+            "# TYPE http_requests_total counter",
+        ]
+        for (route, method, status), count in sorted(statuses.items()):
+            lines.append(
+                f'http_requests_total{{route="{route}",method="{method}",status="{status}"}} {count}'
+            )
+        return lines
+
+
+request_latency = LatencyHistogram()
+
+
+def route_label(request, route):
+    # Route template with its router prefix (/api/pixel,
+    # /tiles/{layer}/{z}/{x}/{y}.png). Some FastAPI versions keep the
+    # router-local path on the route, so recover the prefix from the
+    # request path minus the route's concrete part.
+    try:
+        local = route.path_format.format(**request.path_params)
+    except (KeyError, IndexError, ValueError):
+        return route.path
+    path = request.url.path
+    prefix = path[:-len(local)] if local and path.endswith(local) else ""
+    return prefix + route.path
+
+
+def render_caches():
+    lines = [
+        "# HELP cache_hits_total Lookups served from the cache",
+        "# TYPE cache_hits_total counter",
+    ]
+    lines += [f'cache_hits_total{{cache="{name}"}} {c.hits}' for name, c in CACHES.items()]
+    lines += [
+        "# HELP cache_misses_total Lookups that had to be computed or loaded",
+        "# TYPE cache_misses_total counter",
+    ]
+    lines += [f'cache_misses_total{{cache="{name}"}} {c.misses}' for name, c in CACHES.items()]
+    lines += [
+        "# HELP cache_coalesced_total Lookups that joined an identical in-flight computation",
+        "# TYPE cache_coalesced_total counter",
+    ]
+    lines += [
+        f'cache_coalesced_total{{cache="{name}"}} {c.coalesced}'
+        for name, c in CACHES.items() if hasattr(c, "coalesced")
+    ]
+    lines += [
+        "# HELP cache_hit_ratio hits / (hits + misses) since startup",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for name, c in CACHES.items():
+        lookups = c.hits + c.misses
+        lines.append(f'cache_hit_ratio{{cache="{name}"}} {c.hits / lookups if lookups else 0.0:.4f}')
+    return lines
+
+
+@router.get("/metrics")
+def metrics():
+    body = "\n".join(request_latency.render() + render_caches()) + "\n"
+    return Response(body, media_type="text/plain; version=0.0.4")
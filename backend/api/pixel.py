@@ -1,8 +1,13 @@
-from fastapi import APIRouter
-import rasterio
+from fastapi import APIRouter, HTTPException
 from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
 from pyproj import Transformer
 
+from backend.api.async_io import CoalescingCache, run_io
+from backend.api.raster_store import RasterStore
+
 router = APIRouter()
 
 # Define paths to rasters
@@ -22,62 +27,150 @@ LULC_CLASSES = {
     5: "Built-up"
 }
 
+# Memory-mapped rasters, loaded at app startup (see backend/main.py)
+raster_store = RasterStore({
+    "lulc_2018": LULC_2018_PATH,
+    "lulc_2023": LULC_2023_PATH,
+    "confidence_2018": CONFIDENCE_2018_PATH,
+    "confidence_2023": CONFIDENCE_2023_PATH,
+})
+
 # Initialize Transformer
 # EPSG:4326 (Lat/Lon) -> EPSG:32644 (Projected, used by Rasters)
 transformer = Transformer.from_crs("EPSG:4326", "EPSG:32644", always_xy=True)
+inverse_transformer = Transformer.from_crs("EPSG:32644", "EPSG:4326", always_xy=True)
 
-@router.get("/pixel")
-def get_pixel_value(lat: float, lon: float):
-    # Transform coordinates
-    x, y = transformer.transform(lon, lat)
-    
+# Upper bound on points per /pixels request (explicit or densified transect)
+MAX_POINTS = 100_000
+
+# Identical concurrent clicks share one lookup; results live for a few seconds
+pixel_cache = CoalescingCache(ttl=10.0)
+
+
+def query_year(year, x, y):
     result = {}
-    
-    # Query 2018
     try:
-        with rasterio.open(LULC_2018_PATH) as src:
-            for val in src.sample([(x, y)]):
-                class_id = int(val[0])
-                # Check for nodata
-                if class_id == src.nodata:
-                    result["2018"] = {"class_name": "No Data"}
-                else:
-                    result["2018"] = {
-                        "class_id": class_id,
-                        "class_name": LULC_CLASSES.get(class_id, "Unknown")
-                    }
-        
-        # Get Confidence 2018
-        if "class_id" in result.get("2018", {}):
-            with rasterio.open(CONFIDENCE_2018_PATH) as src:
-                for val in src.sample([(x, y)]):
-                    result["2018"]["confidence"] = float(val[0])
+        lulc = raster_store.get(f"lulc_{year}")
+        class_id = int(lulc.value_at(x, y))
+        # Check for nodata
+        if class_id == lulc.nodata:
+            result = {"class_name": "No Data"}
+        else:
+            result = {
+                "class_id": class_id,
+                "class_name": LULC_CLASSES.get(class_id, "Unknown")
+            }
+
+        # Get Confidence
+        if "class_id" in result:
+            confidence = raster_store.get(f"confidence_{year}")
+            result["confidence"] = float(confidence.value_at(x, y))
 
     except Exception as e:
-        if "2018" not in result: result["2018"] = {}
-        result["2018"]["error"] = str(e)
+        result["error"] = str(e)
+
+    return result
+
+
+def query_pixel(lat, lon):
+    # Transform coordinates
+    x, y = transformer.transform(lon, lat)
+
+    return {
+        "2018": query_year(2018, x, y),
+        "2023": query_year(2023, x, y)
+    }
+
+
+@router.get("/pixel")
+async def get_pixel_value(lat: float, lon: float):
+    return await pixel_cache.get(("pixel", lat, lon), query_pixel, lat, lon)
 
-    # Query 2023
+
+class PixelsQuery(BaseModel):
+    # Either explicit points (lats/lons) or a transect polyline of
+    # [lat, lon] vertices sampled every step_m metres
+    lats: Optional[List[float]] = None
+    lons: Optional[List[float]] = None
+    line: Optional[List[Tuple[float, float]]] = None
+    step_m: float = 30.0
+
+
+def densify_line(xs, ys, step_m):
+    # Points every step_m along the polyline (projected metres), plus the end
+    seg = np.hypot(np.diff(xs), np.diff(ys))
+    dist = np.concatenate([[0.0], np.cumsum(seg)])
+
+    n = int(dist[-1] // step_m) + 1
+    if n + 1 > MAX_POINTS:
+        raise HTTPException(status_code=413, detail=f"Transect exceeds {MAX_POINTS} points")
+
+    samples = np.arange(n) * step_m
+    if dist[-1] > samples[-1]:
+        samples = np.append(samples, dist[-1])
+
+    return np.interp(samples, dist, xs), np.interp(samples, dist, ys), samples
+
+
+def query_year_bulk(year, xs, ys):
+    # Columnar result; class_id 0 means no data, with confidence 0
     try:
-        with rasterio.open(LULC_2023_PATH) as src:
-            for val in src.sample([(x, y)]):
-                class_id = int(val[0])
-                if class_id == src.nodata:
-                    result["2023"] = {"class_name": "No Data"}
-                else:
-                    result["2023"] = {
-                        "class_id": class_id,
-                        "class_name": LULC_CLASSES.get(class_id, "Unknown")
-                    }
-        
-        # Get Confidence 2023
-        if "class_id" in result.get("2023", {}):
-            with rasterio.open(CONFIDENCE_2023_PATH) as src:
-                for val in src.sample([(x, y)]):
-                    result["2023"]["confidence"] = float(val[0])
+        lulc = raster_store.get(f"lulc_{year}")
+        class_ids = lulc.values_at(xs, ys).astype(np.int64)
+        if lulc.nodata is not None:
+            class_ids[class_ids == lulc.nodata] = 0
+
+        confidence = raster_store.get(f"confidence_{year}").values_at(xs, ys)
+        confidence = np.where(class_ids > 0, confidence, 0).astype(np.float64)
 
+        return {
+            "class_id": class_ids.tolist(),
+            "confidence": confidence.tolist()
+        }
     except Exception as e:
-        if "2023" not in result: result["2023"] = {}
-        result["2023"]["error"] = str(e)
+        return {"error": str(e)}
+
+
+def query_pixels(query):
+    result = {}
+
+    if query.line is not None:
+        if len(query.line) < 2:
+            raise HTTPException(status_code=422, detail="line needs at least two vertices")
+        if not np.isfinite(query.step_m) or query.step_m <= 0:
+            raise HTTPException(status_code=422, detail="step_m must be a positive number")
+
+        line = np.asarray(query.line, dtype=np.float64)
+        vx, vy = transformer.transform(line[:, 1], line[:, 0])
+        # Vertices outside the projection's valid range come back as inf
+        if not (np.isfinite(vx).all() and np.isfinite(vy).all()):
+            raise HTTPException(status_code=422, detail="line has vertices outside the valid lat/lon range")
+        xs, ys, distance = densify_line(np.asarray(vx), np.asarray(vy), query.step_m)
+        lons, lats = inverse_transformer.transform(xs, ys)
+        result["distance_m"] = distance.tolist()
+    else:
+        if query.lats is None or query.lons is None or len(query.lats) != len(query.lons):
+            raise HTTPException(
+                status_code=422,
+                detail="Provide equal-length lats and lons, or a line"
+            )
+        if len(query.lats) > MAX_POINTS:
+            raise HTTPException(status_code=413, detail=f"More than {MAX_POINTS} points")
+
+        lats = np.asarray(query.lats, dtype=np.float64)
+        lons = np.asarray(query.lons, dtype=np.float64)
+        # One vectorised transform for all points
+        xs, ys = transformer.transform(lons, lats)
+
+    result["lat"] = np.asarray(lats).tolist()
+    result["lon"] = np.asarray(lons).tolist()
+    result["classes"] = LULC_CLASSES
+    result["2018"] = query_year_bulk(2018, xs, ys)
+    result["2023"] = query_year_bulk(2023, xs, ys)
 
     return result
+
+
+@router.post("/pixels")
+async def get_pixel_values(query: PixelsQuery):
+    return await run_io(query_pixels, query)
@@ -0,0 +1,161 @@
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+# Uncompressed .npy copies of the served rasters. Every uvicorn worker
+# memory-maps the same files, so the OS page cache holds one physical copy.
+CACHE_DIR = Path("data/processed/cache/rasters")
+
+# How often (seconds) a raster's source file is re-stat'ed for changes
+CHECK_INTERVAL_S = 2.0
+
+CONVERT_BLOCK_ROWS = 512
+
+
+class RasterArray:
+    def __init__(self, path, array, transform, nodata, signature):
+        self.path = path
+        self.array = array
+        self.transform = transform
+        self.inverse = ~transform
+        self.nodata = nodata
+        self.signature = signature
+
+    def value_at(self, x, y):
+        # O(1) lookup of the pixel containing (x, y); nodata outside the grid
+        col, row = self.inverse * (x, y)
+        row, col = math.floor(row), math.floor(col)
+        height, width = self.array.shape
+        if 0 <= row < height and 0 <= col < width:
+            return self.array[row, col]
+        return self.nodata if self.nodata is not None else 0
+
+    def values_at(self, xs, ys):
+        # Vectorised value_at for coordinate arrays (pyproj returns inf
+        # for points it cannot transform; those end up outside the grid)
+        with np.errstate(invalid="ignore"):
+            cols, rows = self.inverse * (np.asarray(xs), np.asarray(ys))
+            rows = np.floor(rows)
+            cols = np.floor(cols)
+
+        height, width = self.array.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+
+        fill = self.nodata if self.nodata is not None else 0
+        out = np.full(rows.shape, fill, dtype=self.array.dtype)
+        out[inside] = self.array[
+            rows[inside].astype(np.intp), cols[inside].astype(np.intp)
+        ]
+        return out
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _cache_path(name, signature):
+    mtime_ns, size = signature
+    return CACHE_DIR / f"{name}-{mtime_ns}-{size}.npy"
+
+
+def _build_cache(path, cache_path):
+    # Written under a temporary name and renamed into place, so workers
+    # racing to build the same cache never see a partial file
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp.npy")
+
+    with rasterio.open(path) as src:
+        out = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=src.dtypes[0], shape=(src.height, src.width)
+        )
+        for row in range(0, src.height, CONVERT_BLOCK_ROWS):
+            rows = min(CONVERT_BLOCK_ROWS, src.height - row)
+            out[row:row + rows] = src.read(1, window=Window(0, row, src.width, rows))
+        out.flush()
+        del out
+
+    try:
+        os.replace(tmp_path, cache_path)
+    except FileNotFoundError:
+        # Another worker built the same cache first (and may have cleaned
+        # up our temporary file)
+        if not cache_path.exists():
+            raise
+
+
+def _remove_stale(name, keep):
+    for old in CACHE_DIR.glob(f"{name}-*.npy"):
+        # Other workers' caches still being written
+        if old.name.endswith(".tmp.npy"):
+            continue
+        if old != keep:
+            try:
+                old.unlink()
+            except OSError:
+                pass
+
+
+class RasterStore:
+    def __init__(self, paths):
+        self.paths = {name: Path(p) for name, p in paths.items()}
+        self._rasters = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        for name in self.paths:
+            try:
+                self._load(name)
+            except (OSError, rasterio.errors.RasterioIOError) as e:
+                print(f"Raster store: {name} not loaded ({e})")
+
+    def get(self, name):
+        now = time.monotonic()
+        raster = self._rasters.get(name)
+
+        if raster is not None and now - self._checked.get(name, 0) < CHECK_INTERVAL_S:
+            return raster
+
+        with self._lock:
+            raster = self._rasters.get(name)
+            try:
+                signature = _signature(self.paths[name])
+            except FileNotFoundError:
+                self._rasters.pop(name, None)
+                raise
+
+            if raster is None or raster.signature != signature:
+                raster = self._load(name, signature)
+            self._checked[name] = now
+
+        return raster
+
+    def _load(self, name, signature=None):
+        path = self.paths[name]
+        signature = signature or _signature(path)
+
+        cache_path = _cache_path(name, signature)
+        if not cache_path.exists():
+            _build_cache(path, cache_path)
+            _remove_stale(name, keep=cache_path)
+
+        with rasterio.open(path) as src:
+            transform, nodata = src.transform, src.nodata
+
+        raster = RasterArray(
+            path,
+            np.load(cache_path, mmap_mode="r"),
+            transform,
+            nodata,
+            signature
+        )
+        self._rasters[name] = raster
+        self._checked[name] = time.monotonic()
+        return raster
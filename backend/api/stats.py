@@ -1,17 +1,50 @@
-from fastapi import APIRouter
-import json
+from fastapi import APIRouter, HTTPException, Request
 from pathlib import Path
+from typing import Optional
+
+from backend.api.async_io import CoalescingCache, run_io
+from backend.api.http_cache import CachedJSONFile, cached_json_response
+from backend.api.count_table import CountTable, bbox_histogram
+from backend.api.zonal import zone_summary, zone_transition_matrix
 
 router = APIRouter()
 
 DATA_DIR = Path("data/processed/stats")
 
+summary_cache = CachedJSONFile(DATA_DIR / "summary_stats.json")
+transition_matrix_cache = CachedJSONFile(DATA_DIR / "transition_matrix.json")
+count_table = CountTable(
+    DATA_DIR / "transition_counts_sat.npy",
+    DATA_DIR / "transition_counts_sat.json"
+)
+
+# /summary and /transition-matrix for the same viewport share one count
+viewport_cache = CoalescingCache(ttl=30.0)
+
+
+def viewport_counts(bbox):
+    # (from, to) histogram inside bbox plus the pixel area in km²
+    try:
+        table = count_table.get()
+        hist = bbox_histogram(table, bbox)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Statistics not generated: {e}")
+
+    transform = table["transform"]
+    return hist, abs(transform.a * transform.e) / 1e6
+
 @router.get("/summary")
-def summary():
-    with open(DATA_DIR / "summary_stats.json") as f:
-        return json.load(f)
+async def summary(request: Request, bbox: Optional[str] = None):
+    if bbox is None:
+        return await run_io(cached_json_response, request, summary_cache)
+
+    hist, pixel_area_km2 = await viewport_cache.get(bbox, viewport_counts, bbox)
+    return zone_summary(hist.sum(axis=1), hist.sum(axis=0), pixel_area_km2)
 
 @router.get("/transition-matrix")
-def transition_matrix():
-    with open(DATA_DIR / "transition_matrix.json") as f:
-        return json.load(f)
+async def transition_matrix(request: Request, bbox: Optional[str] = None):
+    if bbox is None:
+        return await run_io(cached_json_response, request, transition_matrix_cache)
+
+    hist, pixel_area_km2 = await viewport_cache.get(bbox, viewport_counts, bbox)
+    return zone_transition_matrix(hist, pixel_area_km2)
@@ -0,0 +1,261 @@
+import asyncio
+import math
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from fastapi import APIRouter, HTTPException, Response
+from rasterio.transform import from_bounds as transform_from_bounds
+from rasterio.warp import Resampling, reproject, transform_bounds
+from rasterio.windows import Window, from_bounds as window_from_bounds
+
+router = APIRouter()
+
+DATA_DIR = Path("data/processed")
+PALETTE_DIR = Path(__file__).resolve().parents[2] / "pipeline"
+
+LAYERS = {
+    "lulc_2018": (DATA_DIR / "predictions/lulc_2018.tif", PALETTE_DIR / "lulc_colors.txt"),
+    "lulc_2023": (DATA_DIR / "predictions/lulc_2023.tif", PALETTE_DIR / "lulc_colors.txt"),
+    "change_map": (DATA_DIR / "change/change_map.tif", PALETTE_DIR / "change_colors.txt"),
+}
+
+TILE_SIZE = 256
+MAX_ZOOM = 22
+TILE_CRS = "EPSG:3857"
+WEB_MERCATOR_EXTENT = 2 * math.pi * 6378137
+
+# In-memory LRU (bytes) and optional on-disk cache in front of the renderer
+TILE_CACHE_BYTES = 64 * 2 ** 20
+TILE_DISK_CACHE_DIR = os.environ.get("LULC_TILE_CACHE_DIR")
+
+TILE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=min(8, (os.cpu_count() or 1) + 2),
+    thread_name_prefix="tiles"
+)
+
+
+# =========================
+# Palettes
+# =========================
+def load_palette(path):
+    # gdaldem color-relief file ("value r g b a"), expanded to a 256-entry
+    # RGBA table with gdaldem's default linear interpolation between entries
+    entries = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 4:
+                entries.append([float(v) for v in parts[:5]])
+    entries.sort()
+    entries = np.array(entries)
+    if entries.shape[1] == 4:
+        entries = np.column_stack([entries, np.full(len(entries), 255.0)])
+
+    values = np.arange(256)
+    lut = np.stack(
+        [np.interp(values, entries[:, 0], entries[:, c]) for c in range(1, 5)],
+        axis=1
+    )
+    return np.round(lut).astype(np.uint8)
+
+
+PALETTES = {name: load_palette(palette) for name, (_, palette) in LAYERS.items()}
+
+
+# =========================
+# PNG encoding (palette PNG, one byte per pixel)
+# =========================
+def _png_chunk(tag, data):
+    return (
+        struct.pack(">I", len(data)) + tag + data
+        + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+    )
+
+
+def encode_png(indices, lut):
+    height, width = indices.shape
+    # Filter byte 0 (None) in front of every row
+    raw = np.empty((height, width + 1), dtype=np.uint8)
+    raw[:, 0] = 0
+    raw[:, 1:] = indices
+
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b"PLTE", lut[:, :3].tobytes()),
+        _png_chunk(b"tRNS", lut[:, 3].tobytes()),
+        _png_chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)),
+        _png_chunk(b"IEND", b""),
+    ])
+
+
+# =========================
+# Rendering
+# =========================
+_local = threading.local()
+
+
+def _open(path, signature):
+    # One dataset handle per thread and file version (handles are not
+    # thread-safe)
+    handles = getattr(_local, "handles", None)
+    if handles is None:
+        handles = _local.handles = {}
+
+    key = (str(path), signature)
+    src = handles.get(key)
+    if src is None:
+        for old_key in [k for k in handles if k[0] == key[0]]:
+            handles.pop(old_key).close()
+        src = handles[key] = rasterio.open(path)
+    return src
+
+
+def tile_bounds(z, x, y):
+    size = WEB_MERCATOR_EXTENT / 2 ** z
+    west = -WEB_MERCATOR_EXTENT / 2 + x * size
+    north = WEB_MERCATOR_EXTENT / 2 - y * size
+    return west, north - size, west + size, north
+
+
+def render_tile(layer, signature, z, x, y):
+    path, _ = LAYERS[layer]
+    src = _open(path, signature)
+    nodata = src.nodata if src.nodata is not None else 0
+
+    bounds = tile_bounds(z, x, y)
+    tile = np.full((TILE_SIZE, TILE_SIZE), nodata, dtype=np.uint8)
+
+    # Source window under the tile, clipped to the raster
+    src_bounds = transform_bounds(TILE_CRS, src.crs, *bounds)
+    window = window_from_bounds(*src_bounds, transform=src.transform)
+    col0, row0 = math.floor(window.col_off), math.floor(window.row_off)
+    window = Window(
+        col0,
+        row0,
+        math.ceil(window.col_off + window.width) - col0,
+        math.ceil(window.row_off + window.height) - row0
+    )
+    try:
+        window = window.intersection(Window(0, 0, src.width, src.height))
+    except rasterio.errors.WindowError:
+        return encode_png(tile, PALETTES[layer])
+
+    # Decimated read (served from overviews when present) at roughly the
+    # tile's resolution, never above the native one
+    tile_res = (bounds[2] - bounds[0]) / TILE_SIZE
+    scale = min(1.0, src.res[0] / tile_res * 2)
+    out_h = max(1, math.ceil(window.height * scale))
+    out_w = max(1, math.ceil(window.width * scale))
+
+    data = src.read(1, window=window, out_shape=(out_h, out_w))
+    win_bounds = src.window_bounds(window)
+
+    reproject(
+        source=data,
+        destination=tile,
+        src_transform=transform_from_bounds(*win_bounds, out_w, out_h),
+        src_crs=src.crs,
+        src_nodata=nodata,
+        dst_transform=transform_from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+        dst_crs=TILE_CRS,
+        dst_nodata=nodata,
+        resampling=Resampling.nearest
+    )
+
+    return encode_png(tile, PALETTES[layer])
+
+
+# =========================
+# Caches
+# =========================
+class TileLRU:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._tiles.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._tiles.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        with self._lock:
+            if key in self._tiles:
+                return
+            self._tiles[key] = png
+            self.size += len(png)
+            while self.size > self.max_bytes and self._tiles:
+                _, old = self._tiles.popitem(last=False)
+                self.size -= len(old)
+
+
+tile_cache = TileLRU(TILE_CACHE_BYTES)
+
+
+def _disk_path(layer, signature, z, x, y):
+    version = f"{signature[0]}-{signature[1]}"
+    return Path(TILE_DISK_CACHE_DIR) / layer / version / str(z) / str(x) / f"{y}.png"
+
+
+def get_tile(layer, signature, z, x, y):
+    key = (layer, signature, z, x, y)
+    png = tile_cache.get(key)
+    if png is not None:
+        return png
+
+    disk_path = _disk_path(layer, signature, z, x, y) if TILE_DISK_CACHE_DIR else None
+    if disk_path is not None and disk_path.exists():
+        png = disk_path.read_bytes()
+    else:
+        png = render_tile(layer, signature, z, x, y)
+        if disk_path is not None:
+            disk_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = disk_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, disk_path)
+
+    tile_cache.put(key, png)
+    return png
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.png")
+async def tile(layer: str, z: int, x: int, y: int):
+    if layer not in LAYERS:
+        raise HTTPException(status_code=404, detail=f"Unknown layer: {layer}")
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    path, _ = LAYERS[layer]
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"{layer} has not been generated")
+    # Cached tiles are keyed by the raster version, so a pipeline run
+    # invalidates them without any tile regeneration step
+    signature = (st.st_mtime_ns, st.st_size)
+
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(TILE_EXECUTOR, get_tile, layer, signature, z, x, y)
+
+    return Response(
+        png,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=300"}
+    )
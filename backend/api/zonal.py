@@ -0,0 +1,172 @@
+import math
+
+import numpy as np
+from fastapi import APIRouter, Body, HTTPException
+from rasterio.features import geometry_mask
+from rasterio.transform import Affine
+from rasterio.warp import transform_geom
+
+from backend.api.pixel import LULC_CLASSES, raster_store
+
+router = APIRouter()
+
+YEAR_FROM, YEAR_TO = 2018, 2023
+RASTER_CRS = "EPSG:32644"
+
+# Class codes 0..NUM_CODES-1 (0 = nodata); pair (i, j) is bin i * NUM_CODES + j
+NUM_CODES = max(LULC_CLASSES) + 1
+
+# Polygons per request, and the block size each polygon's bbox is
+# rasterised in (bounds the mask/temporaries for large polygons)
+MAX_POLYGONS = 1000
+BLOCK_SIZE = 512
+
+
+# =========================
+# GeoJSON input
+# =========================
+def _geometries(geojson):
+    # FeatureCollection, Feature or bare (Multi)Polygon → [(id, geometry)]
+    kind = geojson.get("type")
+    if kind == "FeatureCollection":
+        features = geojson.get("features") or []
+        items = [(f.get("id", i), f.get("geometry")) for i, f in enumerate(features)]
+    elif kind == "Feature":
+        items = [(geojson.get("id", 0), geojson.get("geometry"))]
+    else:
+        items = [(0, geojson)]
+
+    if len(items) > MAX_POLYGONS:
+        raise HTTPException(status_code=413, detail=f"More than {MAX_POLYGONS} polygons")
+
+    for zone_id, geometry in items:
+        if not geometry or geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            raise HTTPException(
+                status_code=422,
+                detail=f"Zone {zone_id}: expected a Polygon or MultiPolygon geometry"
+            )
+    return items
+
+
+def _coordinates(geometry):
+    rings = geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        rings = [ring for polygon in rings for ring in polygon]
+    return np.concatenate([np.asarray(ring, dtype=np.float64)[:, :2] for ring in rings])
+
+
+# =========================
+# Counting
+# =========================
+def zone_counts(geometry, lulc_from, lulc_to):
+    # Class histograms of both years and the joint (from, to) histogram
+    # over the pixels whose centres fall inside the polygon. Only blocks
+    # of the polygon's bounding box are read from the memory-mapped
+    # rasters, and the polygon is rasterised once per block.
+    counts_from = np.zeros(NUM_CODES, dtype=np.int64)
+    counts_to = np.zeros(NUM_CODES, dtype=np.int64)
+    pair_counts = np.zeros(NUM_CODES * NUM_CODES, dtype=np.int64)
+
+    height, width = lulc_from.array.shape
+    xs, ys = _coordinates(geometry).T
+    cols, rows = lulc_from.inverse * (xs, ys)
+
+    col_start = max(0, math.floor(cols.min()))
+    col_stop = min(width, math.ceil(cols.max()))
+    row_start = max(0, math.floor(rows.min()))
+    row_stop = min(height, math.ceil(rows.max()))
+
+    for row in range(row_start, row_stop, BLOCK_SIZE):
+        for col in range(col_start, col_stop, BLOCK_SIZE):
+            h = min(BLOCK_SIZE, row_stop - row)
+            w = min(BLOCK_SIZE, col_stop - col)
+
+            inside = geometry_mask(
+                [geometry],
+                out_shape=(h, w),
+                transform=lulc_from.transform * Affine.translation(col, row),
+                invert=True
+            )
+            if not inside.any():
+                continue
+
+            a = lulc_from.array[row:row + h, col:col + w][inside]
+            b = lulc_to.array[row:row + h, col:col + w][inside]
+
+            a = np.where(a < NUM_CODES, a, 0).astype(np.intp)
+            b = np.where(b < NUM_CODES, b, 0).astype(np.intp)
+
+            counts_from += np.bincount(a, minlength=NUM_CODES)
+            counts_to += np.bincount(b, minlength=NUM_CODES)
+
+            valid = (a > 0) & (b > 0)
+            pair_counts += np.bincount(
+                a[valid] * NUM_CODES + b[valid], minlength=NUM_CODES * NUM_CODES
+            )
+
+    return counts_from, counts_to, pair_counts.reshape(NUM_CODES, NUM_CODES)
+
+
+def zone_summary(counts_from, counts_to, pixel_area_km2):
+    # Same shape as /api/summary
+    summary = {}
+    for cls, name in LULC_CLASSES.items():
+        area_from = counts_from[cls] * pixel_area_km2
+        area_to = counts_to[cls] * pixel_area_km2
+
+        net_change = area_to - area_from
+        pct_change = (net_change / area_from) * 100 if area_from > 0 else None
+
+        summary[name] = {
+            f"area_{YEAR_FROM}_sq_km": round(float(area_from), 3),
+            f"area_{YEAR_TO}_sq_km": round(float(area_to), 3),
+            "net_change_sq_km": round(float(net_change), 3),
+            "percent_change": round(float(pct_change), 2) if pct_change is not None else None
+        }
+    return summary
+
+
+def zone_transition_matrix(pair_counts, pixel_area_km2):
+    # Same shape as /api/transition-matrix: {from_class: {to_class: sq_km}}
+    return {
+        from_name: {
+            to_name: round(float(pair_counts[i, j] * pixel_area_km2), 3)
+            for j, to_name in LULC_CLASSES.items()
+        }
+        for i, from_name in LULC_CLASSES.items()
+    }
+
+
+@router.post("/zonal")
+def zonal_stats(geojson: dict = Body(...)):
+    items = _geometries(geojson)
+
+    try:
+        lulc_from = raster_store.get(f"lulc_{YEAR_FROM}")
+        lulc_to = raster_store.get(f"lulc_{YEAR_TO}")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Predictions not generated: {e}")
+
+    if lulc_from.array.shape != lulc_to.array.shape or lulc_from.transform != lulc_to.transform:
+        raise HTTPException(status_code=500, detail="LULC rasters are not on the same grid")
+
+    pixel_area_km2 = abs(lulc_from.transform.a * lulc_from.transform.e) / 1e6
+
+    zones = []
+    for zone_id, geometry in items:
+        try:
+            projected = transform_geom("EPSG:4326", RASTER_CRS, geometry)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Zone {zone_id}: {e}")
+
+        counts_from, counts_to, pair_counts = zone_counts(projected, lulc_from, lulc_to)
+
+        zones.append({
+            "id": zone_id,
+            "pixels": int(counts_from.sum()),
+            "area_sq_km": round(float(counts_from.sum() * pixel_area_km2), 3),
+            "summary": zone_summary(counts_from, counts_to, pixel_area_km2),
+            "transition_matrix": zone_transition_matrix(pair_counts, pixel_area_km2)
+        })
+
+    return {"zones": zones}
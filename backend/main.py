@@ -1,21 +1,55 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.routing import APIRoute
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from backend.api.stats import router as stats_router
-from backend.api.pixel import router as pixel_router
+from backend.api.pixel import router as pixel_router, raster_store
+from backend.api.tiles import router as tiles_router
+from backend.api.zonal import router as zonal_router
+from backend.api.history import router as history_router
+from backend.api.metrics import router as metrics_router, request_latency, route_label
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Memory-map the prediction rasters once per worker process
+    raster_store.load()
+    yield
+
+
+app = FastAPI(title="Tirupati LULC Change Dashboard", lifespan=lifespan)
+
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+
+    # Labelled by route template (/tiles/{layer}/{z}/{x}/{y}.png), so the
+    # series stay bounded; static files and /metrics itself are skipped
+    route = request.scope.get("route")
+    if isinstance(route, APIRoute) and route.path != "/metrics":
+        request_latency.observe(
+            route_label(request, route), request.method, response.status_code,
+            time.perf_counter() - start
+        )
+    return response
+
 
-app = FastAPI(title="Tirupati LULC Change Dashboard")
 app.include_router(stats_router, prefix="/api")
 app.include_router(pixel_router, prefix="/api")
+app.include_router(zonal_router, prefix="/api")
+app.include_router(history_router, prefix="/api")
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+# Serve tiles (rendered on demand from the prediction/change rasters)
+app.include_router(tiles_router)
 
-# Serve tiles
-app.mount(
-    "/tiles",
-    StaticFiles(directory=BASE_DIR / "backend" / "static" / "tiles"),
-    name="tiles"
-)
+# Prometheus scrape endpoint
+app.include_router(metrics_router)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Serve React app
 app.mount(
@@ -7,9 +7,13 @@ const api = axios.create({
     },
 });
 
-export const fetchSummary = async () => {
+// Optional bbox = [minLon, minLat, maxLon, maxLat] limits the stats to
+// a map viewport (served from the precomputed count table)
+const bboxParams = (bbox) => (bbox ? { params: { bbox: bbox.join(',') } } : undefined);
+
+export const fetchSummary = async (bbox) => {
     try {
-        const response = await api.get('/summary');
+        const response = await api.get('/summary', bboxParams(bbox));
         return response.data;
     } catch (error) {
         console.error('Error fetching summary stats:', error);
@@ -17,9 +21,9 @@ export const fetchSummary = async () => {
     }
 };
 
-export const fetchTransitionMatrix = async () => {
+export const fetchTransitionMatrix = async (bbox) => {
     try {
-        const response = await api.get('/transition-matrix');
+        const response = await api.get('/transition-matrix', bboxParams(bbox));
         return response.data;
     } catch (error) {
         console.error('Error fetching transition matrix:', error);
@@ -37,4 +41,53 @@ export const fetchPixelValue = async (lat, lon) => {
     }
 };
 
+// Class/confidence for every processed year: { years, history: [{ year, ... }] }
+export const fetchPixelHistory = async (lat, lon) => {
+    try {
+        const response = await api.get('/pixel/history', { params: { lat, lon } });
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching pixel history:', error);
+        throw error;
+    }
+};
+
+// Bulk lookup: points = [[lat, lon], ...]. Returns columnar arrays
+// (lat, lon, and per-year class_id / confidence lists).
+export const fetchPixelValues = async (points) => {
+    try {
+        const response = await api.post('/pixels', {
+            lats: points.map(([lat]) => lat),
+            lons: points.map(([, lon]) => lon),
+        });
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching pixel values:', error);
+        throw error;
+    }
+};
+
+// Transect profile sampled every stepM metres along line = [[lat, lon], ...]
+export const fetchTransect = async (line, stepM = 30) => {
+    try {
+        const response = await api.post('/pixels', { line, step_m: stepM });
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching transect:', error);
+        throw error;
+    }
+};
+
+// Per-polygon class areas and transition matrix. geojson is a
+// FeatureCollection / Feature / (Multi)Polygon in lon/lat.
+export const fetchZonalStats = async (geojson) => {
+    try {
+        const response = await api.post('/zonal', geojson);
+        return response.data;
+    } catch (error) {
+        console.error('Error fetching zonal stats:', error);
+        throw error;
+    }
+};
+
 export default api;
@@ -1,11 +1,43 @@
 import rasterio
-from rasterio.warp import reproject, Resampling
+from rasterio.warp import reproject, transform_bounds, Resampling
+from rasterio.windows import Window, bounds as window_bounds, from_bounds, transform as window_transform
 import numpy as np
 
-from .config import PROCESSED_DIR
-from .lulc_class_mapping import WORLD_COVER_MAPPING
+from config import PROCESSED_DIR
+from profiling import profiled, add_pixels
+from lulc_class_mapping import WORLD_COVER_MAPPING
+from blocks import iter_windows
+from cog import output_profile, finalize_cog
 
+# WorldCover class → project class in one gather; unmapped codes → 0
+WORLD_COVER_LUT = np.zeros(256, dtype=np.uint8)
+for wc_class, proj_class in WORLD_COVER_MAPPING.items():
+    WORLD_COVER_LUT[wc_class] = proj_class
 
+# Extra source pixels read around each window's footprint, so nearest
+# neighbour never needs a pixel just outside the block
+SOURCE_PAD = 2
+
+
+def source_window(src, dst_window, dst_transform, dst_crs):
+    # Block of the source raster covering a destination window, or None
+    # if the window lies outside the source
+    bounds = window_bounds(dst_window, dst_transform)
+    if src.crs != dst_crs:
+        bounds = transform_bounds(dst_crs, src.crs, *bounds, densify_pts=21)
+
+    win = from_bounds(*bounds, transform=src.transform)
+    col0 = max(0, int(np.floor(win.col_off)) - SOURCE_PAD)
+    row0 = max(0, int(np.floor(win.row_off)) - SOURCE_PAD)
+    col1 = min(src.width, int(np.ceil(win.col_off + win.width)) + SOURCE_PAD)
+    row1 = min(src.height, int(np.ceil(win.row_off + win.height)) + SOURCE_PAD)
+
+    if col0 >= col1 or row0 >= row1:
+        return None
+    return Window(col0, row0, col1 - col0, row1 - row0)
+
+
+@profiled
 def align_labels():
     # Paths
     ref_path = PROCESSED_DIR / "2018" / "landsat_2018_tirupati.tif"
@@ -19,40 +51,41 @@ def align_labels():
         ref_transform = ref.transform
         ref_height = ref.height
         ref_width = ref.width
-
-    # Load WorldCover labels
-    with rasterio.open(label_src_path) as src:
-        src_data = src.read(1)
-
-        # Destination array aligned to Landsat grid
-        aligned = np.zeros((ref_height, ref_width), dtype=np.uint8)
-
-        reproject(
-            source=src_data
-            ,
-            destination=aligned,
-            src_transform=src.transform,
-            src_crs=src.crs,
-            dst_transform=ref_transform,
-            dst_crs=ref_crs,
-            resampling=Resampling.nearest
-        )
-
-    # Remap WorldCover classes → Project LULC classes
-    remapped = np.zeros_like(aligned, dtype=np.uint8)
-    for wc_class, proj_class in WORLD_COVER_MAPPING.items():
-        remapped[aligned == wc_class] = proj_class
+        add_pixels(ref_width * ref_height)
 
     # Output metadata
-    out_meta = ref_meta.copy()
-    out_meta.update({
+    out_meta = output_profile(ref_meta, **{
         "count": 1,
         "dtype": "uint8",
         "nodata": 0
     })
 
-    with rasterio.open(out_path, "w", **out_meta) as dst:
-        dst.write(remapped, 1)
+    # =========================
+    # Windowed reprojection + remap
+    # =========================
+    # Each Landsat window reads only the WorldCover block under it
+    with rasterio.open(label_src_path) as src, \
+         rasterio.open(out_path, "w", **out_meta) as dst:
+
+        for window in iter_windows(ref_width, ref_height):
+            aligned = np.zeros((window.height, window.width), dtype=np.uint8)
+
+            src_window = source_window(src, window, ref_transform, ref_crs)
+            if src_window is not None:
+                reproject(
+                    source=src.read(1, window=src_window),
+                    destination=aligned,
+                    src_transform=window_transform(src_window, src.transform),
+                    src_crs=src.crs,
+                    dst_transform=window_transform(window, ref_transform),
+                    dst_crs=ref_crs,
+                    resampling=Resampling.nearest
+                )
+
+            # Remap WorldCover classes → Project LULC classes
+            dst.write(WORLD_COVER_LUT[aligned], 1, window=window)
+
+    finalize_cog(out_path)
 
     print("Aligned LULC labels saved to:")
     print(out_path)
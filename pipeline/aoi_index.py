@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.transform import Affine
+from rasterio.windows import Window, transform as window_transform
+
+from config import PROCESSED_DIR, AOI_SHAPEFILE, BLOCK_SIZE
+from blocks import iter_windows
+
+CACHE_DIR = PROCESSED_DIR / "cache" / "aoi"
+
+# Per-block flags
+OUTSIDE, INSIDE, PARTIAL = 0, 1, 2
+
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj")
+
+
+# =========================
+# AOI index
+# =========================
+# The AOI rasterised once per target grid: the crop window that
+# rasterio.mask.mask(crop=True) would use, a bit-packed inside/outside
+# mask over that window, and a flag per block_size block so clips can
+# skip outside blocks and copy inside blocks without a per-pixel test.
+# Cached on disk, keyed by the shapefile version and the grid.
+class AOIIndex:
+    def __init__(self, crop, transform, packed, flags, block_size):
+        self.crop = crop
+        self.transform = transform
+        self.width = int(crop.width)
+        self.height = int(crop.height)
+        self.packed = packed
+        self.flags = flags
+        self.block_size = block_size
+
+    def windows(self):
+        # Block windows over the cropped grid, with their flag
+        for window in iter_windows(self.width, self.height, self.block_size):
+            yield window, self.flag(window)
+
+    def flag(self, window):
+        # Flag of the block a (block-aligned) window belongs to
+        return self.flags[window.row_off // self.block_size, window.col_off // self.block_size]
+
+    def mask(self, window):
+        # Bool inside-AOI mask for a window of the cropped grid
+        rows = slice(window.row_off, window.row_off + window.height)
+        byte0 = window.col_off // 8
+        byte1 = -(-(window.col_off + window.width) // 8)
+        bits = np.unpackbits(self.packed[rows, byte0:byte1], axis=1)
+        offset = window.col_off - byte0 * 8
+        return bits[:, offset:offset + window.width].astype(bool)
+
+    def source_window(self, window):
+        # Same block on the grid the index was built for
+        return Window(
+            window.col_off + self.crop.col_off,
+            window.row_off + self.crop.row_off,
+            window.width,
+            window.height
+        )
+
+
+def _shapefile_signature():
+    parts = []
+    for suffix in SHAPEFILE_PARTS:
+        path = AOI_SHAPEFILE.with_suffix(suffix)
+        if path.exists():
+            st = os.stat(path)
+            parts.append([suffix, st.st_mtime_ns, st.st_size])
+    return parts
+
+
+def _cache_key(grid, crs, block_size):
+    key = json.dumps([
+        _shapefile_signature(),
+        list(grid.transform)[:6],
+        grid.width,
+        grid.height,
+        crs.to_string(),
+        block_size
+    ])
+    return hashlib.sha256(key.encode()).hexdigest()[:24]
+
+
+def build_aoi_index(grid, crs, block_size=BLOCK_SIZE):
+    aoi = gpd.read_file(AOI_SHAPEFILE)
+    if aoi.crs != crs:
+        aoi = aoi.to_crs(crs)
+
+    # As rasterio.mask.mask(crop=True)
+    crop = geometry_window(grid, aoi.geometry)
+    crop = Window(int(crop.col_off), int(crop.row_off), int(crop.width), int(crop.height))
+    transform = window_transform(crop, grid.transform)
+
+    packed = np.zeros((crop.height, -(-crop.width // 8)), dtype=np.uint8)
+    flags = np.zeros(
+        (-(-crop.height // block_size), -(-crop.width // block_size)), dtype=np.uint8
+    )
+
+    # One strip of blocks at a time keeps the unpacked mask small
+    for row in range(0, crop.height, block_size):
+        rows = min(block_size, crop.height - row)
+        strip = geometry_mask(
+            aoi.geometry,
+            out_shape=(rows, crop.width),
+            transform=transform * Affine.translation(0, row),
+            invert=True
+        )
+        packed[row:row + rows] = np.packbits(strip, axis=1)
+
+        for j, col in enumerate(range(0, crop.width, block_size)):
+            block = strip[:, col:col + block_size]
+            if block.all():
+                flags[row // block_size, j] = INSIDE
+            elif block.any():
+                flags[row // block_size, j] = PARTIAL
+
+    return AOIIndex(crop, transform, packed, flags, block_size)
+
+
+def aoi_index(grid, crs, block_size=BLOCK_SIZE):
+    # grid: anything with transform/width/height (an open dataset, or
+    # the mosaic grid in preprocess_chain)
+    path = CACHE_DIR / f"{_cache_key(grid, crs, block_size)}.npz"
+
+    if path.exists():
+        with np.load(path) as data:
+            crop = Window(*data["crop"].tolist())
+            return AOIIndex(
+                crop,
+                window_transform(crop, grid.transform),
+                data["packed"],
+                data["flags"],
+                block_size
+            )
+
+    index = build_aoi_index(grid, crs, block_size)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+    np.savez(
+        tmp_path,
+        crop=np.array([index.crop.col_off, index.crop.row_off, index.crop.width, index.crop.height]),
+        packed=index.packed,
+        flags=index.flags
+    )
+    os.replace(tmp_path, path)
+
+    counts = np.bincount(index.flags.ravel(), minlength=3)
+    print(
+        f"AOI index built: {index.width} x {index.height}, blocks inside {counts[INSIDE]}, "
+        f"partial {counts[PARTIAL]}, outside {counts[OUTSIDE]}"
+    )
+    return index
+
+
+def clip_blocks(src, index, dst, fill):
+    # Write src clipped to the AOI into dst (on the index's cropped grid):
+    # outside blocks are filled without reading, inside blocks are copied
+    # and only partial blocks are masked per pixel
+    count = dst.count
+    indexes = list(range(1, count + 1))
+    src_nodata = src.nodata
+
+    for window, flag in index.windows():
+        if flag == OUTSIDE:
+            dst.write(
+                np.full((count, window.height, window.width), fill, dtype=dst.dtypes[0]),
+                window=window
+            )
+            continue
+
+        block = src.read(indexes, window=index.source_window(window)).astype(dst.dtypes[0])
+
+        # Source nodata becomes the fill value, as with mask(..., nodata=fill)
+        if src_nodata is not None and not np.isnan(src_nodata) and src_nodata != fill:
+            block[block == src_nodata] = fill
+
+        if flag == PARTIAL:
+            block[:, ~index.mask(window)] = fill
+
+        dst.write(block, window=window)
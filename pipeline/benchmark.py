@@ -0,0 +1,445 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+from config import (
+    PROJECT_ROOT,
+    RAW_LANDSAT_DIR,
+    PROCESSED_DIR,
+    AOI_SHAPEFILE,
+    TARGET_CRS,
+    TARGET_RESOLUTION,
+    YEAR_T1,
+    YEAR_T2,
+    LULC_CLASSES
+)
+
+BENCH_YEARS = (YEAR_T1, YEAR_T2)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+
+# Child processes report their measurements on a line starting with this
+RESULT_MARKER = "BENCHMARK_RESULT "
+
+# =========================
+# Synthetic scenes
+# =========================
+# Landsat Collection 2 surface reflectance: DN = (reflectance + 0.2) / 2.75e-5
+SR_SCALE = 2.75e-5
+SR_OFFSET = -0.2
+
+# Per-class reflectance (B2 blue, B3 green, B4 red, B5 NIR); row 0 unused
+SIGNATURES = np.array([
+    [0.00, 0.00, 0.00, 0.00],
+    [0.03, 0.05, 0.03, 0.30],   # Forest
+    [0.06, 0.06, 0.04, 0.02],   # Water
+    [0.05, 0.08, 0.07, 0.35],   # Agriculture
+    [0.12, 0.15, 0.18, 0.25],   # Barren
+    [0.10, 0.11, 0.12, 0.18],   # Built-up
+])
+NOISE_SD = 0.01
+
+QA_CLEAR = 21824                # Landsat 8 clear-land QA_PIXEL value
+QA_CLOUD = QA_CLEAR | (1 << 3)
+CLOUD_FRACTION = 0.03
+
+# Class patches, cloud blobs and the agriculture → built-up change are
+# drawn on coarse cells of this many pixels
+PATCH_SIZE = 32
+CLOUD_CELL = 16
+CHANGE_FRACTION = 0.2
+
+# WorldCover-style labels: 10 m (3 Landsat pixels per side) with some
+# label noise
+LABEL_UPSAMPLE = 3
+LABEL_NOISE = 0.02
+
+ORIGIN_X, ORIGIN_Y = 310_000.0, 1_520_000.0
+
+
+def _coarse(rng, height, width, cell, values):
+    coarse = values(rng, (-(-height // cell), -(-width // cell)))
+    return np.repeat(np.repeat(coarse, cell, axis=0), cell, axis=1)[:height, :width]
+
+
+def synthetic_classes(rng, height, width):
+    classes = _coarse(
+        rng, height, width, PATCH_SIZE,
+        lambda r, shape: r.integers(1, len(LULC_CLASSES) + 1, size=shape)
+    ).astype(np.uint8)
+
+    # Second year: part of the agriculture is built over
+    changed = classes.copy()
+    urbanised = _coarse(
+        rng, height, width, PATCH_SIZE,
+        lambda r, shape: r.random(shape) < CHANGE_FRACTION
+    )
+    changed[urbanised & (classes == 3)] = 5
+    return classes, changed
+
+
+def _write(path, array, transform, **profile):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(
+        path, "w",
+        driver="GTiff",
+        height=array.shape[0],
+        width=array.shape[1],
+        count=1,
+        dtype=array.dtype,
+        crs=TARGET_CRS,
+        transform=transform,
+        tiled=True,
+        compress="deflate",
+        **profile
+    ) as dst:
+        dst.write(array, 1)
+
+
+def write_scene(scene_dir, classes, transform, rng):
+    # One raw scene: SR_B2..SR_B5 and QA_PIXEL, named like USGS downloads
+    name = scene_dir.name
+    for i, band in enumerate(["B2", "B3", "B4", "B5"]):
+        reflectance = SIGNATURES[classes, i] + rng.normal(0, NOISE_SD, classes.shape)
+        dn = np.clip((reflectance - SR_OFFSET) / SR_SCALE, 1, 65535).astype(np.uint16)
+        _write(scene_dir / f"{name}_SR_{band}.TIF", dn, transform, nodata=0)
+
+    cloud = _coarse(
+        rng, *classes.shape, CLOUD_CELL,
+        lambda r, shape: r.random(shape) < CLOUD_FRACTION
+    )
+    qa = np.where(cloud, QA_CLOUD, QA_CLEAR).astype(np.uint16)
+    _write(scene_dir / f"{name}_QA_PIXEL.TIF", qa, transform)
+
+
+def write_labels(path, classes, rng):
+    from lulc_class_mapping import WORLD_COVER_MAPPING
+
+    to_worldcover = np.zeros(len(LULC_CLASSES) + 1, dtype=np.uint8)
+    for wc_class, proj_class in WORLD_COVER_MAPPING.items():
+        to_worldcover[proj_class] = wc_class
+
+    labels = to_worldcover[
+        np.repeat(np.repeat(classes, LABEL_UPSAMPLE, axis=0), LABEL_UPSAMPLE, axis=1)
+    ]
+    noisy = rng.random(labels.shape) < LABEL_NOISE
+    labels[noisy] = rng.choice(list(WORLD_COVER_MAPPING), size=int(noisy.sum()))
+
+    resolution = TARGET_RESOLUTION / LABEL_UPSAMPLE
+    _write(path, labels, from_origin(ORIGIN_X, ORIGIN_Y, resolution, resolution), nodata=0)
+
+
+def write_aoi(path, width_m, height_m):
+    # Ellipse over the middle of the mosaic, stored in lon/lat like the
+    # district boundary
+    import geopandas as gpd
+    from pyproj import Transformer
+    from shapely.geometry import Polygon
+
+    angle = np.linspace(0, 2 * np.pi, 128, endpoint=False)
+    xs = ORIGIN_X + width_m / 2 + 0.45 * width_m * np.cos(angle)
+    ys = ORIGIN_Y - height_m / 2 + 0.45 * height_m * np.sin(angle)
+    lons, lats = Transformer.from_crs(TARGET_CRS, "EPSG:4326", always_xy=True).transform(xs, ys)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    gpd.GeoDataFrame(geometry=[Polygon(zip(lons, lats))], crs="EPSG:4326").to_file(path)
+
+
+def generate_inputs(size, seed):
+    # Two overlapping size x size scenes per year (offset by half a scene,
+    # like adjacent WRS paths), WorldCover-style labels and the AOI.
+    # Deterministic for a given (size, seed).
+    rng = np.random.default_rng(seed)
+    height, width = size, size + size // 2
+
+    classes = dict(zip(BENCH_YEARS, synthetic_classes(rng, height, width)))
+
+    for year in BENCH_YEARS:
+        for path_row, col in ((142051, 0), (143051, size // 2)):
+            scene_dir = RAW_LANDSAT_DIR / str(year) / f"LC08_L2SP_{path_row}_{year}0301"
+            transform = from_origin(
+                ORIGIN_X + col * TARGET_RESOLUTION, ORIGIN_Y,
+                TARGET_RESOLUTION, TARGET_RESOLUTION
+            )
+            write_scene(scene_dir, classes[year][:, col:col + size], transform, rng)
+
+    write_labels(
+        PROCESSED_DIR / "labels" / "worldcover_tirupati_raw.tif", classes[YEAR_T1], rng
+    )
+    write_aoi(AOI_SHAPEFILE, width * TARGET_RESOLUTION, height * TARGET_RESOLUTION)
+
+
+# =========================
+# Stages
+# =========================
+# Each runs in its own process (fresh peak RSS, no warm caches from the
+# previous stage) and returns the number of pixels it processed.
+def _pixels(path):
+    with rasterio.open(path) as src:
+        return src.width * src.height
+
+
+def stage_process_scene():
+    from cloud_mask_landsat import process_scene, find_scene_files
+
+    pixels = 0
+    for year in BENCH_YEARS:
+        for scene_dir in sorted((RAW_LANDSAT_DIR / str(year)).iterdir()):
+            pixels += _pixels(find_scene_files(scene_dir)[1])
+            process_scene(scene_dir, year)
+    return pixels
+
+
+def stage_mosaic_year():
+    from mosaic_landsat import mosaic_year
+    return sum(_pixels(mosaic_year(year)) for year in BENCH_YEARS)
+
+
+def stage_clip_raster():
+    from clip_to_aoi import clip_raster
+
+    pixels = 0
+    for year in BENCH_YEARS:
+        pixels += _pixels(PROCESSED_DIR / str(year) / f"landsat_{year}_mosaic.tif")
+        clip_raster(year)
+    return pixels
+
+
+def stage_align_labels():
+    from align_labels_to_landsat_2018 import align_labels
+    align_labels()
+    return _pixels(PROCESSED_DIR / "labels" / "lulc_labels_tirupati.tif")
+
+
+def stage_extract_training_data():
+    from extract_training_data import extract_training_data
+    extract_training_data()
+    return _pixels(PROCESSED_DIR / str(YEAR_T1) / f"landsat_{YEAR_T1}_tirupati.tif")
+
+
+def stage_train_rf():
+    # "Pixels" here are training samples
+    from train_lulc_rf import train_rf
+    train_rf()
+    with np.load(PROCESSED_DIR / "training" / "training_pixels_2018.npz") as data:
+        return len(data["label"])
+
+
+def stage_infer_year():
+    from infer_lulc import infer_year
+
+    pixels = 0
+    for year in BENCH_YEARS:
+        infer_year(year)
+        pixels += _pixels(PROCESSED_DIR / "predictions" / f"lulc_{year}.tif")
+    return pixels
+
+
+def stage_compute_change():
+    from compute_change import compute_change
+    compute_change(YEAR_T1, YEAR_T2)
+    return _pixels(PROCESSED_DIR / "predictions" / f"lulc_{YEAR_T1}.tif")
+
+
+def stage_timeseries():
+    # Trajectory store ingest, trajectory statistics and history store
+    import timeseries
+    timeseries.main()
+    return sum(
+        _pixels(PROCESSED_DIR / "predictions" / f"lulc_{year}.tif") for year in BENCH_YEARS
+    )
+
+
+STAGES = {
+    "process_scene": stage_process_scene,
+    "mosaic_year": stage_mosaic_year,
+    "clip_raster": stage_clip_raster,
+    "align_labels": stage_align_labels,
+    "extract_training_data": stage_extract_training_data,
+    "train_rf": stage_train_rf,
+    "infer_year": stage_infer_year,
+    "compute_change": stage_compute_change,
+    "timeseries": stage_timeseries,
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS. Children covers worker
+    # pools (largest single worker).
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return peak * scale / 2 ** 20
+
+
+def run_stage(name):
+    # Child side: time one stage and print its measurements
+    start = time.perf_counter()
+    pixels = STAGES[name]()
+    seconds = time.perf_counter() - start
+
+    print(RESULT_MARKER + json.dumps({
+        "seconds": seconds,
+        "megapixels": pixels / 1e6,
+        "peak_rss_mb": _peak_rss_mb()
+    }))
+
+
+# =========================
+# Driver
+# =========================
+def make_workspace(workdir):
+    # Copy of the pipeline sources under workdir, so config.PROJECT_ROOT
+    # (and with it every data path) points into the scratch tree
+    shutil.copytree(
+        PROJECT_ROOT / "pipeline", workdir / "pipeline",
+        ignore=shutil.ignore_patterns("__pycache__", "benchmark_baseline.json")
+    )
+
+
+def benchmark_stage(workdir, name):
+    proc = subprocess.run(
+        [sys.executable, str(Path("pipeline") / "benchmark.py"), "--stage", name],
+        cwd=workdir,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+        raise RuntimeError(f"Stage {name} failed (exit {proc.returncode})")
+
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            result = json.loads(line[len(RESULT_MARKER):])
+            break
+    else:
+        raise RuntimeError(f"Stage {name} reported no result")
+
+    result["mp_per_s"] = result["megapixels"] / result["seconds"] if result["seconds"] else 0.0
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # Regressions: throughput down, or peak memory up, by more than
+    # `tolerance` (fraction) against the baseline
+    regressions = []
+    for name, result in results["stages"].items():
+        base = baseline["stages"].get(name)
+        if base is None:
+            continue
+
+        result["speed_vs_baseline"] = result["mp_per_s"] / base["mp_per_s"]
+        result["rss_vs_baseline"] = result["peak_rss_mb"] / base["peak_rss_mb"]
+
+        if result["speed_vs_baseline"] < 1 - tolerance:
+            regressions.append(f"{name}: {result['speed_vs_baseline']:.2f}x baseline throughput")
+        if result["rss_vs_baseline"] > 1 + tolerance:
+            regressions.append(f"{name}: {result['rss_vs_baseline']:.2f}x baseline peak RSS")
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'stage':<24}{'seconds':>10}{'MP':>10}{'MP/s':>10}{'RSS MB':>10}{'vs base':>16}")
+    for name, r in results["stages"].items():
+        versus = ""
+        if "speed_vs_baseline" in r:
+            versus = f"{r['speed_vs_baseline']:.2f}x / {r['rss_vs_baseline']:.2f}x"
+        print(
+            f"{name:<24}{r['seconds']:>10.2f}{r['megapixels']:>10.2f}"
+            f"{r['mp_per_s']:>10.2f}{r['peak_rss_mb']:>10.0f}{versus:>16}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time every pipeline stage on deterministic synthetic rasters"
+    )
+    parser.add_argument("--size", type=int, default=1024, help="scene edge in pixels")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, help="scratch directory (default: temporary)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed fractional slowdown / memory growth")
+    parser.add_argument("--out", type=Path, help="also write the results JSON here")
+    parser.add_argument("--stage", choices=list(STAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_stage(args.stage)
+        return
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="lulc-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    try:
+        make_workspace(workdir)
+
+        print(f"Generating synthetic inputs ({args.size} px scenes) in {workdir}...")
+        subprocess.run(
+            [sys.executable, "-c",
+             f"import benchmark; benchmark.generate_inputs({args.size}, {args.seed})"],
+            cwd=workdir / "pipeline",
+            check=True
+        )
+
+        results = {
+            "size": args.size,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "stages": {}
+        }
+        for name in STAGES:
+            print(f"Running {name}...")
+            results["stages"][name] = benchmark_stage(workdir, name)
+    finally:
+        if not args.keep and args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print("Baseline saved:", args.baseline)
+    elif args.baseline.exists():
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["size"], baseline["seed"]) == (args.size, args.seed):
+            regressions = compare(results, baseline, args.tolerance)
+        else:
+            print(f"Baseline was recorded at size {baseline['size']}, seed {baseline['seed']}; not compared")
+
+    print_report(results)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(" ", line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
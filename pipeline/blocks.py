@@ -0,0 +1,16 @@
+from rasterio.windows import Window
+
+from config import BLOCK_SIZE
+
+
+def iter_windows(width, height, block_size=BLOCK_SIZE):
+    # Row-major square windows covering a width x height grid; edge
+    # windows are clipped to the grid.
+    for row_off in range(0, height, block_size):
+        for col_off in range(0, width, block_size):
+            yield Window(
+                col_off,
+                row_off,
+                min(block_size, width - col_off),
+                min(block_size, height - row_off)
+            )
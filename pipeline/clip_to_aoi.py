@@ -1,50 +1,51 @@
 import rasterio
-from rasterio.mask import mask
-import geopandas as gpd
 import numpy as np
 
-from config import PROCESSED_DIR, AOI_SHAPEFILE
+from config import PROCESSED_DIR, YEARS
+from profiling import profiled, add_pixels
+from cog import output_profile, finalize_cog
+from aoi_index import aoi_index, clip_blocks
 
+@profiled
 def clip_raster(year):
     print(f"\nClipping mosaic for {year} to Tirupati AOI...")
 
-    raster_path = PROCESSED_DIR / str(year) / f"landsat_{year}_mosaic.tif"
-    if not raster_path.exists():
-        raise FileNotFoundError(raster_path)
+    # GeoTIFF mosaic or the virtual mosaic written by mosaic_year(mode="vrt"),
+    # whichever is newer
+    mosaic_path = PROCESSED_DIR / str(year) / f"landsat_{year}_mosaic.tif"
+    candidates = [
+        p for p in (mosaic_path, mosaic_path.with_suffix(".vrt")) if p.exists()
+    ]
+    if not candidates:
+        raise FileNotFoundError(mosaic_path)
+    raster_path = max(candidates, key=lambda p: p.stat().st_mtime)
 
-    aoi = gpd.read_file(AOI_SHAPEFILE)
+    out_path = PROCESSED_DIR / str(year) / f"landsat_{year}_tirupati.tif"
 
     with rasterio.open(raster_path) as src:
-        # Reproject AOI to raster CRS if needed
-        if aoi.crs != src.crs:
-            aoi = aoi.to_crs(src.crs)
-
-        out_image, out_transform = mask(
-            src,
-            aoi.geometry,
-            crop=True,
-            nodata=np.nan
-        )
-
-        out_meta = src.meta.copy()
-        out_meta.update({
-            "height": out_image.shape[1],
-            "width": out_image.shape[2],
-            "transform": out_transform,
+        # AOI rasterised once per mosaic grid (cached across years/runs)
+        index = aoi_index(src, src.crs)
+
+        out_meta = output_profile(src.meta, **{
+            "height": index.height,
+            "width": index.width,
+            "transform": index.transform,
             "nodata": np.nan,
             "dtype": "float32"
         })
 
-    out_path = PROCESSED_DIR / str(year) / f"landsat_{year}_tirupati.tif"
+        add_pixels(index.width * index.height)
+
+        with rasterio.open(out_path, "w", **out_meta) as dest:
+            clip_blocks(src, index, dest, np.nan)
 
-    with rasterio.open(out_path, "w", **out_meta) as dest:
-        dest.write(out_image.astype("float32"))
+    finalize_cog(out_path, resampling="average")
 
     print(f"Saved clipped raster: {out_path.name}")
 
 def main():
-    clip_raster(2018)
-    clip_raster(2023)
+    for year in YEARS:
+        clip_raster(year)
 
 if __name__ == "__main__":
     main()
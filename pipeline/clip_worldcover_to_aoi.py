@@ -1,11 +1,12 @@
 import rasterio
-from rasterio.mask import mask
-import geopandas as gpd
-import numpy as np
 from pathlib import Path
 
-from config import AOI_SHAPEFILE, PROCESSED_DIR
+from config import PROCESSED_DIR
+from profiling import profiled
+from cog import output_profile, finalize_cog
+from aoi_index import aoi_index, clip_blocks
 
+@profiled
 def clip_worldcover():
     worldcover_path = Path("data/lulc_reference/worldcover.tif")
     out_dir = PROCESSED_DIR / "labels"
@@ -13,33 +14,22 @@ def clip_worldcover():
 
     out_path = out_dir / "worldcover_tirupati_raw.tif"
 
-    # Load AOI
-    aoi = gpd.read_file(AOI_SHAPEFILE)
-
     with rasterio.open(worldcover_path) as src:
-        # Reproject AOI to raster CRS if understood
-        if aoi.crs != src.crs:
-            aoi = aoi.to_crs(src.crs)
-
-        # Strict polygon clip (no bounding box)
-        out_image, out_transform = mask(
-            src,
-            aoi.geometry,
-            crop=True,
-            nodata=0
-        )
-
-        out_meta = src.meta.copy()
-        out_meta.update({
-            "height": out_image.shape[1],
-            "width": out_image.shape[2],
-            "transform": out_transform,
+        # Strict polygon clip (no bounding box), from the cached AOI index
+        index = aoi_index(src, src.crs)
+
+        out_meta = output_profile(src.meta, **{
+            "height": index.height,
+            "width": index.width,
+            "transform": index.transform,
             "nodata": 0,
             "count": 1
         })
 
-    with rasterio.open(out_path, "w", **out_meta) as dst:
-        dst.write(out_image[0], 1)
+        with rasterio.open(out_path, "w", **out_meta) as dst:
+            clip_blocks(src, index, dst, 0)
+
+    finalize_cog(out_path)
 
     print("WorldCover clipped to Tirupati AOI:")
     print(out_path)
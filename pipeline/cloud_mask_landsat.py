@@ -1,14 +1,33 @@
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 import numpy as np
 import rasterio
 
-from config import RAW_LANDSAT_DIR, PROCESSED_DIR
+from config import (
+    RAW_LANDSAT_DIR,
+    PROCESSED_DIR,
+    BLOCK_SIZE,
+    CLOUD_MASK_WORKERS,
+    CLOUD_MASK_MEMORY_MB,
+    YEARS
+)
+from profiling import profiled, add_pixels, init_worker, take_stages, add_stages
+from blocks import iter_windows
+from cog import output_profile
 
 # Bits to mask in QA_PIXEL (Landsat Collection 2)
 CLOUD_SHADOW_BIT = 4
 CLOUD_BIT = 3
 CIRRUS_BIT = 2
 
+BANDS = ["B2", "B3", "B4", "B5"]
+
+# Per-worker memory: interpreter + libraries, plus GDAL's block cache
+WORKER_BASE_MB = 200
+WORKER_GDAL_CACHE_MB = 64
+
+
 def mask_clouds(qa_array):
     cloud_shadow = (qa_array & (1 << CLOUD_SHADOW_BIT)) != 0
     clouds = (qa_array & (1 << CLOUD_BIT)) != 0
@@ -23,23 +42,16 @@ def find_band(scene_dir, keyword):
     return None
 
 
-def process_scene(scene_dir, year):
-    print(f"Processing scene: {scene_dir.name}")
-
-    bands = {}
-    meta = None
-
-    for band in ["B2", "B3", "B4", "B5"]:
+def find_scene_files(scene_dir):
+    band_files = []
+    for band in BANDS:
         band_file = find_band(scene_dir, band)
         if band_file is None:
             raise FileNotFoundError(
                 f"Missing band {band} in scene {scene_dir.name}\n"
                 f"Available files: {[f.name for f in scene_dir.iterdir()]}"
             )
-
-        with rasterio.open(band_file) as src:
-            bands[band] = src.read(1).astype(np.float32)
-            meta = src.meta
+        band_files.append(band_file)
 
     qa_file = find_band(scene_dir, "QA_PIXEL")
     if qa_file is None:
@@ -48,50 +60,119 @@ def process_scene(scene_dir, year):
             f"Available files: {[f.name for f in scene_dir.iterdir()]}"
         )
 
-    with rasterio.open(qa_file) as qa_src:
-        qa = qa_src.read(1)
-
-    mask = mask_clouds(qa)
+    return band_files, qa_file
 
-    for band in bands:
-        bands[band][mask] = np.nan
 
-    stacked = np.stack([
-        bands["B2"],
-        bands["B3"],
-        bands["B4"],
-        bands["B5"]
-    ])
+def mask_block(bands, qa):
+    # bands: (4, rows, cols) float32, masked in place
+    bands[:, mask_clouds(qa)] = np.nan
 
     # 🔒 CRITICAL FIX:
     # Mask pixels where ALL bands are zero (outside scene footprint)
-    valid_mask = np.any(stacked != 0, axis=0)
-
-    stacked[:, ~valid_mask] = np.nan
-
+    valid_mask = np.any(bands != 0, axis=0)
+
+    bands[:, ~valid_mask] = np.nan
+    return bands
+
+
+class MaskedScene:
+    # Read-only view of a raw scene that applies the cloud mask on read, so
+    # the mosaic can pull masked blocks without a *_masked.tif on disk.
+    def __init__(self, scene_dir, stack):
+        band_files, qa_file = find_scene_files(scene_dir)
+        self.name = scene_dir.name
+        self.band_srcs = [stack.enter_context(rasterio.open(f)) for f in band_files]
+        self.qa_src = stack.enter_context(rasterio.open(qa_file))
+
+        grid = self.band_srcs[-1]
+        self.meta = grid.meta.copy()
+        self.meta.update({"count": 4, "dtype": "float32", "nodata": np.nan})
+        self.count = len(self.band_srcs)
+        self.crs = grid.crs
+        self.res = grid.res
+        self.bounds = grid.bounds
+        self.width = grid.width
+        self.height = grid.height
+
+    def read(self, window):
+        bands = np.empty((self.count, window.height, window.width), dtype=np.float32)
+        for i, src in enumerate(self.band_srcs):
+            bands[i] = src.read(1, window=window)
+
+        qa = self.qa_src.read(1, window=window)
+        return mask_block(bands, qa)
+
+
+@profiled
+def process_scene(scene_dir, year, block_size=BLOCK_SIZE):
+    print(f"Processing scene: {scene_dir.name}")
 
     out_dir = PROCESSED_DIR / str(year) / "cloud_masked"
     out_dir.mkdir(parents=True, exist_ok=True)
 
     out_path = out_dir / f"{scene_dir.name}_masked.tif"
 
-    meta.update({
-        "count": 4,
-        "dtype": "float32",
-        "nodata": np.nan
-    })
+    with ExitStack() as stack:
+        scene = MaskedScene(scene_dir, stack)
+        add_pixels(scene.width * scene.height)
+        # Intermediate product: tiled + compressed, no overviews
+        dst = stack.enter_context(
+            rasterio.open(out_path, "w", **output_profile(scene.meta))
+        )
 
-    with rasterio.open(out_path, "w", **meta) as dst:
-        dst.write(stacked)
+        # =========================
+        # Block-streamed masking
+        # =========================
+        for window in iter_windows(scene.width, scene.height, block_size):
+            dst.write(scene.read(window), window=window)
 
     print(f"  Saved masked scene to {out_path.name}")
+    return out_path
+
+
+def _process_scene_worker(scene_dir, year, block_size):
+    with rasterio.Env(GDAL_CACHEMAX=WORKER_GDAL_CACHE_MB):
+        out_path = process_scene(scene_dir, year, block_size)
+    # The worker's profile records go back with the result
+    return out_path, take_stages()
+
+
+def plan_workers(n_scenes, workers, memory_mb, block_size=BLOCK_SIZE):
+    # Working set per block: 4 float32 bands, the uint16 QA block and
+    # a few boolean masks
+    block_mb = block_size * block_size * (4 * 4 + 2 + 4) / 2 ** 20
+    per_worker_mb = WORKER_BASE_MB + WORKER_GDAL_CACHE_MB + block_mb
+
+    by_memory = int(memory_mb // per_worker_mb)
+    return max(1, min(workers, n_scenes, by_memory))
+
+
+@profiled
+def process_year(year, workers=None, memory_mb=None, block_size=BLOCK_SIZE):
+    workers = workers or CLOUD_MASK_WORKERS
+    memory_mb = memory_mb or CLOUD_MASK_MEMORY_MB
 
-def process_year(year):
     year_dir = RAW_LANDSAT_DIR / str(year)
-    for scene in year_dir.iterdir():
-        if scene.is_dir():
-            process_scene(scene, year)
+    scenes = sorted(scene for scene in year_dir.iterdir() if scene.is_dir())
+
+    workers = plan_workers(len(scenes), workers, memory_mb, block_size)
+
+    if workers == 1:
+        for scene in scenes:
+            process_scene(scene, year, block_size)
+        return
+
+    print(f"Masking {len(scenes)} scenes for {year} on {workers} workers...")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        futures = [
+            pool.submit(_process_scene_worker, scene, year, block_size)
+            for scene in scenes
+        ]
+        for future in futures:
+            _, stages = future.result()
+            add_stages(stages)
 
 if __name__ == "__main__":
-    process_year(2018)
-    process_year(2023)
+    for year in YEARS:
+        process_year(year)
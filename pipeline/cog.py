@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import rasterio
+import rasterio.shutil
+
+from config import COG_BLOCK_SIZE, COG_COMPRESS, COG_LEVEL
+
+
+def output_profile(meta, **updates):
+    # Tiled, compressed GTiff profile for a stage's (windowed) writes.
+    # finalize_cog() then rewrites the file in COG layout with overviews.
+    profile = meta.copy()
+    profile.update(updates)
+
+    is_float = np.issubdtype(np.dtype(profile["dtype"]), np.floating)
+    profile.update({
+        "driver": "GTiff",
+        "tiled": True,
+        "blockxsize": COG_BLOCK_SIZE,
+        "blockysize": COG_BLOCK_SIZE,
+        "compress": COG_COMPRESS.lower(),
+        "predictor": 3 if is_float else 2,
+        "BIGTIFF": "IF_SAFER",
+    })
+    return profile
+
+
+def finalize_cog(path, resampling="nearest"):
+    # Rewrite in COG layout: tiles, overviews ahead of the full-resolution
+    # data, and compression with predictor. Use "nearest" for class rasters
+    # and "average" for continuous ones.
+    tmp_path = path.with_name(f"{path.stem}.cog.tmp{path.suffix}")
+
+    rasterio.shutil.copy(
+        path,
+        tmp_path,
+        driver="COG",
+        BLOCKSIZE=COG_BLOCK_SIZE,
+        COMPRESS=COG_COMPRESS,
+        LEVEL=COG_LEVEL,
+        PREDICTOR="YES",
+        OVERVIEWS="AUTO",
+        OVERVIEW_RESAMPLING=resampling.upper(),
+        BIGTIFF="IF_SAFER",
+        NUM_THREADS="ALL_CPUS",
+    )
+    os.replace(tmp_path, path)
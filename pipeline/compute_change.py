@@ -0,0 +1,252 @@
+import json
+import os
+import rasterio
+import numpy as np
+import pandas as pd
+
+from config import (
+    PROCESSED_DIR,
+    LULC_CLASSES,
+    PIXEL_AREA_KM2,
+    YEAR_T1,
+    YEAR_T2,
+    BLOCK_SIZE,
+    STATS_BLOCK_SIZE
+)
+from profiling import profiled, add_pixels
+from blocks import iter_windows
+from cog import output_profile, finalize_cog
+
+# Class codes 0..NUM_CODES-1 (0 = nodata); pair (i, j) is bin i * NUM_CODES + j
+NUM_CODES = max(LULC_CLASSES) + 1
+
+
+def change_block(a, b, p, q):
+    # -------------------------
+    # Transition map: i*10 + j
+    # -------------------------
+    transition = np.zeros_like(a, dtype=np.uint8)
+    valid = (a > 0) & (b > 0)
+    transition[valid] = (a[valid] * 10 + b[valid]).astype(np.uint8)
+
+    # -------------------------
+    # Transition probability
+    # -------------------------
+    p = p.astype(np.float32)
+    q = q.astype(np.float32)
+
+    prob = np.zeros_like(p, dtype=np.float32)
+    valid_p = (p > 0) & (q > 0)
+    prob[valid_p] = p[valid_p] * q[valid_p]
+
+    return transition, prob
+
+
+def accumulate_counts(a, b, class_counts_from, class_counts_to, pair_counts):
+    # Histograms over raw class codes (as compute_class_summary counts them)
+    class_counts_from += np.bincount(a.ravel(), minlength=256)[:256]
+    class_counts_to += np.bincount(b.ravel(), minlength=256)[:256]
+
+    # Joint histogram of valid (from, to) pairs
+    valid = (a > 0) & (b > 0) & (a < NUM_CODES) & (b < NUM_CODES)
+    pairs = a[valid].astype(np.intp) * NUM_CODES + b[valid]
+    pair_counts += np.bincount(pairs, minlength=NUM_CODES * NUM_CODES)
+
+
+def accumulate_block_counts(a, b, window, block_counts, block_size=STATS_BLOCK_SIZE):
+    # Per-cell joint histogram of (from, to) codes, nodata and out-of-range
+    # codes folded into 0. The window is zero-padded to whole cells; the
+    # padding only lands in the (0, 0) bin.
+    n_codes = NUM_CODES * NUM_CODES
+    codes = (
+        np.where(a < NUM_CODES, a, 0).astype(np.intp) * NUM_CODES
+        + np.where(b < NUM_CODES, b, 0)
+    )
+
+    rows, cols = codes.shape
+    codes = np.pad(codes, ((0, -rows % block_size), (0, -cols % block_size)))
+    n_by = codes.shape[0] // block_size
+    n_bx = codes.shape[1] // block_size
+
+    cells = codes.reshape(n_by, block_size, n_bx, block_size).transpose(0, 2, 1, 3)
+    cells = cells.reshape(n_by * n_bx, block_size * block_size)
+    cell_ids = np.arange(n_by * n_bx)[:, None] * n_codes
+
+    by = window.row_off // block_size
+    bx = window.col_off // block_size
+    block_counts[by:by + n_by, bx:bx + n_bx] += np.bincount(
+        (cell_ids + cells).ravel(), minlength=n_by * n_bx * n_codes
+    ).reshape(n_by, n_bx, n_codes)
+
+
+def write_count_table(block_counts, src, out_npy, out_json,
+                      year_from=YEAR_T1, year_to=YEAR_T2,
+                      block_size=STATS_BLOCK_SIZE):
+    # Summed-area table over the cells: sat[i, j] holds the counts of all
+    # cells above and left of (i, j), so any cell rectangle is 4 lookups
+    n_by, n_bx, n_codes = block_counts.shape
+    dtype = np.int32 if src.width * src.height < 2 ** 31 else np.int64
+
+    sat = np.zeros((n_by + 1, n_bx + 1, n_codes), dtype=dtype)
+    sat[1:, 1:] = block_counts.cumsum(axis=0).cumsum(axis=1)
+
+    meta = {
+        "block_size": block_size,
+        "width": src.width,
+        "height": src.height,
+        "transform": list(src.transform)[:6],
+        "num_codes": NUM_CODES,
+        "year_from": year_from,
+        "year_to": year_to,
+    }
+    with open(out_json, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Table last, replaced rather than overwritten: the API memory-maps
+    # it and reloads the metadata when the table changes
+    tmp_path = out_npy.with_name(out_npy.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, sat)
+    os.replace(tmp_path, out_npy)
+
+
+def write_summary(class_counts_from, class_counts_to, out_json,
+                  year_from=YEAR_T1, year_to=YEAR_T2):
+    summary = {}
+
+    for cls, name in LULC_CLASSES.items():
+        area_from = class_counts_from[cls] * PIXEL_AREA_KM2
+        area_to = class_counts_to[cls] * PIXEL_AREA_KM2
+
+        net_change = area_to - area_from
+        pct_change = (
+            (net_change / area_from) * 100
+            if area_from > 0 else None
+        )
+
+        summary[name] = {
+            f"area_{year_from}_sq_km": round(area_from, 3),
+            f"area_{year_to}_sq_km": round(area_to, 3),
+            "net_change_sq_km": round(net_change, 3),
+            "percent_change": round(pct_change, 2) if pct_change is not None else None
+        }
+
+    with open(out_json, "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+def write_transition_matrix(pair_counts, out_csv, out_json):
+    pair_counts = pair_counts.reshape(NUM_CODES, NUM_CODES)
+
+    records = []
+    for i, from_name in LULC_CLASSES.items():
+        for j, to_name in LULC_CLASSES.items():
+            records.append({
+                "from_class": from_name,
+                "to_class": to_name,
+                "area_sq_km": round(pair_counts[i, j] * PIXEL_AREA_KM2, 3)
+            })
+
+    df = pd.DataFrame(records)
+
+    total_area = df["area_sq_km"].sum()
+    df["percentage"] = round((df["area_sq_km"] / total_area) * 100, 2)
+
+    df.to_csv(out_csv, index=False)
+
+    # Matrix form {from_class: {to_class: area_sq_km}} served by the API
+    pivot_df = df.pivot(index="from_class", columns="to_class", values="area_sq_km")
+    with open(out_json, "w") as f:
+        json.dump(pivot_df.to_dict(orient="index"), f, indent=4)
+
+
+@profiled
+def compute_change(year_from=YEAR_T1, year_to=YEAR_T2):
+    pred_dir = PROCESSED_DIR / "predictions"
+    change_dir = PROCESSED_DIR / "change"
+    stats_dir = PROCESSED_DIR / "stats"
+    change_dir.mkdir(parents=True, exist_ok=True)
+    stats_dir.mkdir(parents=True, exist_ok=True)
+
+    lulc_from = pred_dir / f"lulc_{year_from}.tif"
+    lulc_to = pred_dir / f"lulc_{year_to}.tif"
+    conf_from = pred_dir / f"confidence_{year_from}.tif"
+    conf_to = pred_dir / f"confidence_{year_to}.tif"
+
+    map_out = change_dir / "change_map.tif"
+    prob_out = change_dir / "transition_probability.tif"
+    summary_out = stats_dir / "summary_stats.json"
+    matrix_csv = stats_dir / "transition_matrix.csv"
+    matrix_json = stats_dir / "transition_matrix.json"
+    sat_out = stats_dir / "transition_counts_sat.npy"
+    sat_meta = stats_dir / "transition_counts_sat.json"
+
+    print(f"\nComputing change {year_from} → {year_to} in one pass...")
+
+    class_counts_from = np.zeros(256, dtype=np.int64)
+    class_counts_to = np.zeros(256, dtype=np.int64)
+    pair_counts = np.zeros(NUM_CODES * NUM_CODES, dtype=np.int64)
+
+    if BLOCK_SIZE % STATS_BLOCK_SIZE:
+        raise ValueError("STATS_BLOCK_SIZE must divide BLOCK_SIZE")
+
+    with rasterio.open(lulc_from) as a_src, rasterio.open(lulc_to) as b_src, \
+         rasterio.open(conf_from) as p_src, rasterio.open(conf_to) as q_src:
+
+        for src in (b_src, p_src, q_src):
+            if src.shape != a_src.shape or src.transform != a_src.transform:
+                raise ValueError(f"{src.name} is not on the {lulc_from.name} grid")
+
+        add_pixels(a_src.width * a_src.height)
+        block_counts = np.zeros(
+            (
+                -(-a_src.height // STATS_BLOCK_SIZE),
+                -(-a_src.width // STATS_BLOCK_SIZE),
+                NUM_CODES * NUM_CODES
+            ),
+            dtype=np.int64
+        )
+
+        map_meta = output_profile(a_src.meta, dtype="uint8", count=1, nodata=0)
+        prob_meta = output_profile(p_src.meta, dtype="float32", count=1, nodata=0.0)
+
+        with rasterio.open(map_out, "w", **map_meta) as map_dst, \
+             rasterio.open(prob_out, "w", **prob_meta) as prob_dst:
+
+            for window in iter_windows(a_src.width, a_src.height):
+                a = a_src.read(1, window=window)
+                b = b_src.read(1, window=window)
+                p = p_src.read(1, window=window)
+                q = q_src.read(1, window=window)
+
+                transition, prob = change_block(a, b, p, q)
+                map_dst.write(transition, 1, window=window)
+                prob_dst.write(prob, 1, window=window)
+
+                # -------------------------
+                # Area histograms
+                # -------------------------
+                accumulate_counts(
+                    a, b, class_counts_from, class_counts_to, pair_counts
+                )
+                accumulate_block_counts(a, b, window, block_counts)
+
+        write_count_table(
+            block_counts, a_src, sat_out, sat_meta, year_from, year_to
+        )
+
+    finalize_cog(map_out)
+    finalize_cog(prob_out, resampling="average")
+
+    write_summary(
+        class_counts_from, class_counts_to, summary_out, year_from, year_to
+    )
+    write_transition_matrix(pair_counts, matrix_csv, matrix_json)
+
+    print("Change outputs saved:")
+    for path in (map_out, prob_out, summary_out, matrix_csv, matrix_json, sat_out):
+        print(f"  - {path}")
+
+
+if __name__ == "__main__":
+    compute_change()
@@ -2,6 +2,7 @@ import rasterio
 import numpy as np
 import json
 from config import PROCESSED_DIR
+from profiling import profiled
 
 
 CLASS_NAMES = {
@@ -15,6 +16,7 @@ CLASS_NAMES = {
 PIXEL_AREA_KM2 = 0.0009
 
 
+@profiled
 def compute_class_summary():
     pred_dir = PROCESSED_DIR / "predictions"
     out_dir = PROCESSED_DIR / "stats"
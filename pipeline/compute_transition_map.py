@@ -1,8 +1,11 @@
 import rasterio
 import numpy as np
 from config import PROCESSED_DIR
+from profiling import profiled
+from cog import output_profile, finalize_cog
 
 
+@profiled
 def compute_transition_map():
     pred_dir = PROCESSED_DIR / "predictions"
     out_dir = PROCESSED_DIR / "change"
@@ -16,8 +19,7 @@ def compute_transition_map():
         a = src18.read(1)
         b = src23.read(1)
 
-        meta = src18.meta.copy()
-        meta.update(dtype="uint8", count=1, nodata=0)
+        meta = output_profile(src18.meta, dtype="uint8", count=1, nodata=0)
 
         # Encode transition: i*10 + j
         transition = np.zeros_like(a, dtype=np.uint8)
@@ -27,6 +29,7 @@ def compute_transition_map():
         with rasterio.open(out_path, "w", **meta) as dst:
             dst.write(transition, 1)
 
+    finalize_cog(out_path)
     print("Transition-encoded change map saved:", out_path)
 
 
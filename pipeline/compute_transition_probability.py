@@ -1,8 +1,11 @@
 import rasterio
 import numpy as np
 from config import PROCESSED_DIR
+from profiling import profiled
+from cog import output_profile, finalize_cog
 
 
+@profiled
 def compute_transition_probability():
     pred_dir = PROCESSED_DIR / "predictions"
     out_dir = PROCESSED_DIR / "change"
@@ -16,8 +19,7 @@ def compute_transition_probability():
         p18 = src18.read(1).astype(np.float32)
         p23 = src23.read(1).astype(np.float32)
 
-        meta = src18.meta.copy()
-        meta.update(dtype="float32", count=1, nodata=0.0)
+        meta = output_profile(src18.meta, dtype="float32", count=1, nodata=0.0)
 
         prob = np.zeros_like(p18, dtype=np.float32)
         valid = (p18 > 0) & (p23 > 0)
@@ -26,6 +28,7 @@ def compute_transition_probability():
         with rasterio.open(out_path, "w", **meta) as dst:
             dst.write(prob, 1)
 
+    finalize_cog(out_path, resampling="average")
     print("Transition probability map saved:", out_path)
 
 
@@ -2,6 +2,7 @@ import rasterio
 import numpy as np
 import pandas as pd
 from config import PROCESSED_DIR
+from profiling import profiled
 
 
 CLASS_NAMES = {
@@ -15,6 +16,7 @@ CLASS_NAMES = {
 PIXEL_AREA_KM2 = 0.0009  # 30m x 30m
 
 
+@profiled
 def compute_transition_stats():
     pred_dir = PROCESSED_DIR / "predictions"
     change_dir = PROCESSED_DIR / "change"
@@ -20,6 +20,11 @@ AOI_SHAPEFILE = AOI_DIR / "tirupati_boundary.shp"
 # =========================
 # TEMPORAL SETTINGS
 # =========================
+# Every year in the time series. Append a year and run timeseries.py to
+# ingest it; earlier years' outputs are reused.
+YEARS = [2018, 2023]
+
+# Default pair for the two-date change products (compute_change.py)
 YEAR_T1 = 2018
 YEAR_T2 = 2023
 
@@ -28,6 +33,7 @@ YEAR_T2 = 2023
 # =========================
 TARGET_CRS = "EPSG:32644"   # UTM Zone 44N (common for Andhra Pradesh)
 TARGET_RESOLUTION = 30      # meters (Landsat)
+PIXEL_AREA_KM2 = TARGET_RESOLUTION ** 2 / 1e6
 
 # =========================
 # LULC CLASSES (FIXED)
@@ -42,6 +48,17 @@ LULC_CLASSES = {
 
 NUM_CLASSES = len(LULC_CLASSES)
 
+# =========================
+# TRAINING DATA
+# =========================
+TRAINING_SAMPLES_PER_CLASS = 100_000   # reservoir size per class
+TRAINING_SAMPLE_SEED = 42
+
+# Model features, in column order: Landsat bands and/or indices registered
+# in features.py (ndvi, ndwi, savi, nir_red, ...). Used for both training
+# and inference.
+FEATURES = ["blue", "green", "red", "nir", "ndvi"]
+
 # =========================
 # MODEL SETTINGS
 # =========================
@@ -59,3 +76,33 @@ RANDOM_FOREST_PARAMS = {
         5: 2.0   # boost built-up
     }
 }
+
+# =========================
+# PERFORMANCE SETTINGS
+# =========================
+INFERENCE_WORKERS = 4          # 1 = serial; >1 runs windows on a process pool
+INFERENCE_BATCH_WINDOWS = 16   # windows handed to a worker per task
+BLOCK_SIZE = 512               # window edge (pixels) for streamed stages
+CLOUD_MASK_WORKERS = 4         # scenes masked concurrently
+CLOUD_MASK_MEMORY_MB = 2048    # RAM budget shared by the masking workers
+MOSAIC_MODE = "windowed"       # "windowed", "vrt" (virtual mosaic) or "merge"
+STATS_BLOCK_SIZE = 16          # cell edge of the transition-count summed-area table (divides BLOCK_SIZE)
+HISTORY_CHUNK_SIZE = 64        # chunk edge of the per-pixel class/confidence history store
+TILE_SIZE = 4096               # tile edge (pixels) of tiled.py jobs (multiple of BLOCK_SIZE)
+TILE_LEASE_SECONDS = 600       # a claimed tile whose worker stops heartbeating is requeued after this
+TILE_MAX_ATTEMPTS = 3          # claims per tile before it is moved to failed/
+
+# =========================
+# SPATIAL POST-PROCESSING (postprocess.py)
+# =========================
+MAJORITY_RADIUS = 1            # majority filter over (2r+1) x (2r+1) windows; 0 = off
+MMU_PIXELS = 6                 # minimum mapping unit: class patches smaller than this merge into a neighbour
+CHANGE_OPENING_RADIUS = 1      # opening that drops change patches narrower than 2r+1 pixels; 0 = off
+POSTPROCESS_WORKERS = 4        # 1 = serial; >1 runs windows on a process pool
+
+# =========================
+# OUTPUT FORMAT (Cloud-Optimized GeoTIFF)
+# =========================
+COG_BLOCK_SIZE = 512           # internal tile size
+COG_COMPRESS = "DEFLATE"       # or "ZSTD" if GDAL is built with it
+COG_LEVEL = 6                  # compression level
@@ -1,50 +1,106 @@
 import rasterio
 import numpy as np
-import pandas as pd
 from pathlib import Path
 
-from config import PROCESSED_DIR
+from config import (
+    PROCESSED_DIR,
+    TRAINING_SAMPLES_PER_CLASS,
+    TRAINING_SAMPLE_SEED,
+    FEATURES
+)
+from profiling import profiled, add_pixels
+from blocks import iter_windows
+from features import FeatureBuffer
 
 
-def extract_training_data():
+class ClassReservoir:
+    # Uniform sample without replacement of up to `size` rows per class over
+    # a stream: every row gets a random key and the `size` smallest keys
+    # seen so far are kept.
+    def __init__(self, size, n_columns, rng):
+        self.size = size
+        self.rng = rng
+        self.n_columns = n_columns
+        self.rows = {}
+        self.keys = {}
+        self.seen = {}
+
+    def add(self, X, y):
+        for cls in np.unique(y):
+            rows = X[y == cls]
+            keys = self.rng.random(len(rows))
+            self.seen[cls] = self.seen.get(cls, 0) + len(rows)
+
+            if cls in self.rows:
+                rows = np.concatenate([self.rows[cls], rows])
+                keys = np.concatenate([self.keys[cls], keys])
+
+            if len(keys) > self.size:
+                keep = np.argpartition(keys, self.size)[:self.size]
+                rows, keys = rows[keep], keys[keep]
+
+            self.rows[cls] = rows
+            self.keys[cls] = keys
+
+    def result(self):
+        classes = sorted(self.rows)
+        if not classes:
+            return np.empty((0, self.n_columns), dtype=np.float32), np.empty(0, dtype=np.uint8)
+        X = np.concatenate([self.rows[c] for c in classes])
+        y = np.concatenate([np.full(len(self.rows[c]), c, dtype=np.uint8) for c in classes])
+        return X, y
+
+
+@profiled
+def extract_training_data(samples_per_class=TRAINING_SAMPLES_PER_CLASS):
     landsat_path = PROCESSED_DIR / "2018" / "landsat_2018_tirupati.tif"
     labels_path = PROCESSED_DIR / "labels" / "lulc_labels_tirupati.tif"
-    out_path = PROCESSED_DIR / "training" / "training_pixels_2018.csv"
+    out_path = PROCESSED_DIR / "training" / "training_pixels_2018.npz"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    with rasterio.open(landsat_path) as src:
-        bands = src.read().astype(np.float32)
+    features = FeatureBuffer(FEATURES)
+    reservoir = ClassReservoir(
+        samples_per_class,
+        len(FEATURES),
+        np.random.default_rng(TRAINING_SAMPLE_SEED)
+    )
 
-    with rasterio.open(labels_path) as lbl:
-        labels = lbl.read(1)
+    with rasterio.open(landsat_path) as src, rasterio.open(labels_path) as lbl:
+        if src.shape != lbl.shape or src.transform != lbl.transform:
+            raise ValueError(f"{labels_path.name} is not on the {landsat_path.name} grid")
+        add_pixels(src.width * src.height)
 
-    # Mask invalid pixels
-    valid_mask = (
-        ~np.isnan(bands).any(axis=0)
-        & (labels > 0)
-    )
+        # =========================
+        # Stream windows
+        # =========================
+        for window in iter_windows(src.width, src.height):
+            bands = src.read(window=window).astype(np.float32)
+            labels = lbl.read(1, window=window)
 
-    blue = bands[0][valid_mask]
-    green = bands[1][valid_mask]
-    red = bands[2][valid_mask]
-    nir = bands[3][valid_mask]
+            # Mask invalid pixels
+            valid_mask = (
+                ~np.isnan(bands).any(axis=0)
+                & (labels > 0)
+            )
+            if not valid_mask.any():
+                continue
 
-    # NDVI
-    ndvi = (nir - red) / (nir + red + 1e-6)
+            X = features.compute(bands, valid_mask)
+            reservoir.add(X, labels[valid_mask])
 
-    y = labels[valid_mask]
+    X, y = reservoir.result()
 
-    df = pd.DataFrame({
-        "blue": blue,
-        "green": green,
-        "red": red,
-        "nir": nir,
-        "ndvi": ndvi,
-        "label": y
-    })
+    # Typed columnar output, loaded directly by train_lulc_rf
+    np.savez(
+        out_path,
+        **{name: X[:, i] for i, name in enumerate(FEATURES)},
+        label=y
+    )
 
-    df.to_csv(out_path, index=False)
     print("Training dataset saved:", out_path)
-    print("Total samples:", len(df))
+    for cls in sorted(reservoir.seen):
+        print(f"  Class {cls}: {len(reservoir.rows[cls])} of {reservoir.seen[cls]} pixels")
+    print("Total samples:", len(y))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+import numpy as np
+
+from config import FEATURES
+
+# Band order of landsat_<year>_tirupati.tif (B2, B3, B4, B5)
+BAND_INDEX = {"blue": 0, "green": 1, "red": 2, "nir": 3}
+
+EPS = 1e-6
+SAVI_L = 0.5
+
+# =========================
+# Index registry
+# =========================
+# name → (bands it reads, kernel). A kernel writes its index for the
+# valid pixels into `out` in place; `b` maps band names to 1-D float32
+# arrays and `scratch` is a float32 work array of the same length.
+INDICES = {}
+
+
+def register_index(name, bands):
+    def decorator(kernel):
+        INDICES[name] = (tuple(bands), kernel)
+        return kernel
+    return decorator
+
+
+def _normalized_difference(a, c, out, scratch):
+    # (a - c) / (a + c + EPS), same operation order as the original NDVI
+    np.subtract(a, c, out=out)
+    np.add(a, c, out=scratch)
+    np.add(scratch, EPS, out=scratch)
+    np.divide(out, scratch, out=out)
+
+
+@register_index("ndvi", ["nir", "red"])
+def ndvi(b, out, scratch):
+    _normalized_difference(b["nir"], b["red"], out, scratch)
+
+
+@register_index("ndwi", ["green", "nir"])
+def ndwi(b, out, scratch):
+    _normalized_difference(b["green"], b["nir"], out, scratch)
+
+
+# Needs a SWIR band, so only usable once swir1 is added to the stack
+@register_index("ndbi", ["swir1", "nir"])
+def ndbi(b, out, scratch):
+    _normalized_difference(b["swir1"], b["nir"], out, scratch)
+
+
+@register_index("savi", ["nir", "red"])
+def savi(b, out, scratch):
+    np.subtract(b["nir"], b["red"], out=out)
+    np.multiply(out, 1 + SAVI_L, out=out)
+    np.add(b["nir"], b["red"], out=scratch)
+    np.add(scratch, SAVI_L, out=scratch)
+    np.divide(out, scratch, out=out)
+
+
+def register_ratio(name, numerator, denominator):
+    @register_index(name, [numerator, denominator])
+    def ratio(b, out, scratch):
+        np.add(b[denominator], EPS, out=scratch)
+        np.divide(b[numerator], scratch, out=out)
+    return ratio
+
+
+register_ratio("nir_red", "nir", "red")
+register_ratio("nir_green", "nir", "green")
+register_ratio("green_red", "green", "red")
+
+
+# =========================
+# Feature buffer
+# =========================
+class FeatureBuffer:
+    # Preallocated (n_pixels, n_features) float32 matrix, grown on demand
+    # and reused for every window. Training and inference both build their
+    # feature rows here, so the columns are computed identically.
+    def __init__(self, features=FEATURES, capacity=0):
+        self.features = list(features)
+
+        bands = []
+        for name in self.features:
+            needed = [name] if name in BAND_INDEX else self._index(name)[0]
+            for band in needed:
+                if band not in BAND_INDEX:
+                    raise ValueError(
+                        f"Feature {name} needs band {band}, which the Landsat stack does not have"
+                    )
+                if band not in bands:
+                    bands.append(band)
+        self.bands = bands
+
+        self.capacity = 0
+        self._reserve(capacity)
+
+    def _index(self, name):
+        if name not in INDICES:
+            raise ValueError(
+                f"Unknown feature: {name} (bands: {list(BAND_INDEX)}, indices: {sorted(INDICES)})"
+            )
+        return INDICES[name]
+
+    def _reserve(self, n_pixels):
+        if n_pixels <= self.capacity:
+            return
+        self.capacity = n_pixels
+        self.X = np.empty((n_pixels, len(self.features)), dtype=np.float32)
+        self.band_values = np.empty((len(self.bands), n_pixels), dtype=np.float32)
+        self.scratch = np.empty(n_pixels, dtype=np.float32)
+
+    def compute(self, bands, valid):
+        # bands: (4, rows, cols) float32 stack, valid: (rows, cols) bool.
+        # Returns a view of the buffer with one row per valid pixel; it is
+        # overwritten by the next call.
+        valid = valid.ravel()
+        n = int(np.count_nonzero(valid))
+        self._reserve(n)
+
+        b = {}
+        for i, band in enumerate(self.bands):
+            np.compress(valid, bands[BAND_INDEX[band]].ravel(), out=self.band_values[i, :n])
+            b[band] = self.band_values[i, :n]
+
+        X = self.X[:n]
+        scratch = self.scratch[:n]
+        for j, name in enumerate(self.features):
+            if name in BAND_INDEX:
+                X[:, j] = b[name]
+            else:
+                self._index(name)[1](b, X[:, j], scratch)
+
+        return X
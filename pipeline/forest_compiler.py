@@ -0,0 +1,261 @@
+import json
+import os
+import numpy as np
+import joblib
+from pathlib import Path
+
+try:
+    import numba
+except ImportError:  # optional: without it inference keeps using the pickled model
+    numba = None
+
+TREE_LEAF = -1
+
+# Pixels traversed side by side per tree. Independent traversals let the
+# CPU overlap the node loads instead of waiting on one path at a time.
+LANES = 16
+
+NODE_DTYPE = np.dtype([("threshold", "<f4"), ("child", "<i4")])
+
+
+# =========================
+# Compile
+# =========================
+# A fitted RandomForestClassifier is flattened into a few contiguous arrays:
+#   nodes       threshold (float32) + child, one 8-byte record per node.
+#               child = (left child << feature_bits) | feature, and the
+#               right child is always left + 1.
+#   leaf_index  node → row of leaf_proba (-1 for split nodes)
+#   leaf_proba  per-leaf class probabilities (float64, as sklearn)
+#   roots, depths  first node and depth of each tree
+# Leaves point to themselves with threshold +inf, so a group of pixels
+# steps through a tree together without branching on leaf/split.
+def compiled_forest_path(model_path):
+    return Path(model_path).with_suffix(".forest")
+
+
+def _flatten_tree(tree):
+    # Breadth-first order puts the two children of a node next to each other
+    left, right = tree.children_left, tree.children_right
+    order = [0]
+    first_child = {}
+    i = 0
+    while i < len(order):
+        node = order[i]
+        if left[node] != TREE_LEAF:
+            first_child[node] = len(order)
+            order.extend((left[node], right[node]))
+        i += 1
+
+    order = np.array(order)
+    is_leaf = left[order] == TREE_LEAF
+    position = np.arange(len(order))
+
+    child = np.array([first_child.get(node, 0) for node in order])
+    child[is_leaf] = position[is_leaf]
+
+    # sklearn tests float32(x) <= float64 threshold. Rounding the threshold
+    # down to the nearest float32 keeps that test exact in float32.
+    threshold = tree.threshold[order]
+    threshold32 = threshold.astype(np.float32)
+    rounded_up = threshold32 > threshold
+    threshold32[rounded_up] = np.nextafter(
+        threshold32[rounded_up], np.float32(-np.inf)
+    )
+    threshold32[is_leaf] = np.inf
+
+    feature = np.where(is_leaf, 0, tree.feature[order])
+
+    value = tree.value[order[is_leaf], 0, :].astype(np.float64)
+    # Leaf values exactly as the tree's predict_proba returns them. Older
+    # scikit-learn stores weighted class counts and divides by their sum
+    # at predict time; newer versions store fractions (sums off from 1 by
+    # rounding) and return them undivided, so dividing those again would
+    # move them by up to 1 ulp. Compare against a pickled model with
+    # n_jobs=1: threaded predict_proba sums trees in arbitrary order.
+    totals = value.sum(axis=1, keepdims=True)
+    if not np.allclose(totals, 1.0):
+        totals[totals == 0] = 1.0
+        value /= totals
+
+    return threshold32, child, feature, is_leaf, value, tree.max_depth
+
+
+def compile_forest(rf, out_dir):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    n_features = rf.n_features_in_
+    feature_bits = max(1, int(np.ceil(np.log2(n_features))))
+
+    nodes, leaf_index, leaf_proba = [], [], []
+    roots, depths = [], []
+    n_nodes = n_leaves = 0
+
+    for estimator in rf.estimators_:
+        threshold, child, feature, is_leaf, value, depth = _flatten_tree(
+            estimator.tree_
+        )
+
+        tree_nodes = np.empty(len(threshold), dtype=NODE_DTYPE)
+        tree_nodes["threshold"] = threshold
+        tree_nodes["child"] = ((child + n_nodes) << feature_bits) | feature
+
+        tree_leaf_index = np.full(len(threshold), -1, dtype=np.int32)
+        tree_leaf_index[is_leaf] = n_leaves + np.arange(is_leaf.sum())
+
+        nodes.append(tree_nodes)
+        leaf_index.append(tree_leaf_index)
+        leaf_proba.append(value)
+        roots.append(n_nodes)
+        depths.append(depth)
+
+        n_nodes += len(threshold)
+        n_leaves += int(is_leaf.sum())
+
+    if n_nodes >= 2 ** (31 - feature_bits):
+        raise ValueError(f"Forest too large to compile ({n_nodes} nodes)")
+
+    arrays = {
+        "nodes": np.concatenate(nodes),
+        "leaf_index": np.concatenate(leaf_index),
+        "leaf_proba": np.concatenate(leaf_proba),
+        "roots": np.array(roots, dtype=np.int32),
+        "depths": np.array(depths, dtype=np.int32),
+        "classes": np.asarray(rf.classes_),
+    }
+    for name, array in arrays.items():
+        # Replace rather than overwrite: running workers may have the old
+        # file memory-mapped
+        tmp_path = out_dir / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, out_dir / f"{name}.npy")
+
+    # Written last: a directory without meta.json is an incomplete compile
+    meta = {
+        "n_trees": len(roots),
+        "n_nodes": n_nodes,
+        "n_leaves": n_leaves,
+        "n_features": n_features,
+        "feature_bits": feature_bits,
+        "feature_names": [str(f) for f in getattr(rf, "feature_names_in_", [])],
+    }
+    with open(out_dir / "meta.json", "w") as f:
+        json.dump(meta, f, indent=4)
+
+    return out_dir
+
+
+# =========================
+# Predict
+# =========================
+def _forest_proba(X, nodes, leaf_index, leaf_proba, roots, depths,
+                  feature_bits, out):
+    n_pixels = X.shape[0]
+    n_classes = leaf_proba.shape[1]
+    feature_mask = (1 << feature_bits) - 1
+    lanes = np.empty(LANES, dtype=np.int32)
+
+    out[:] = 0.0
+    # Tree-major, so one tree's nodes stay in cache across all pixels and
+    # each pixel sums tree probabilities in sklearn's order
+    for t in range(roots.shape[0]):
+        for start in range(0, n_pixels, LANES):
+            m = min(LANES, n_pixels - start)
+            for k in range(m):
+                lanes[k] = roots[t]
+
+            for _ in range(depths[t]):
+                moved = False
+                for k in range(m):
+                    node = nodes[lanes[k]]
+                    child = node.child
+                    step = (child >> feature_bits) + (
+                        X[start + k, child & feature_mask] > node.threshold
+                    )
+                    moved |= step != lanes[k]
+                    lanes[k] = step
+                # Every lane is parked on its leaf
+                if not moved:
+                    break
+
+            for k in range(m):
+                leaf = leaf_index[lanes[k]]
+                for c in range(n_classes):
+                    out[start + k, c] += leaf_proba[leaf, c]
+
+    out /= roots.shape[0]
+
+
+if numba is not None:
+    _forest_proba = numba.njit(nogil=True, cache=True)(_forest_proba)
+
+
+class CompiledForest:
+    # Drop-in for RandomForestClassifier.predict_proba / predict on finite
+    # float32 features (no missing-value routing)
+    def __init__(self, path, mmap_mode=None):
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            self.meta = json.load(f)
+
+        self.nodes = np.load(path / "nodes.npy", mmap_mode=mmap_mode)
+        self.leaf_index = np.load(path / "leaf_index.npy", mmap_mode=mmap_mode)
+        self.leaf_proba = np.load(path / "leaf_proba.npy", mmap_mode=mmap_mode)
+        self.roots = np.load(path / "roots.npy")
+        self.depths = np.load(path / "depths.npy")
+        self.classes_ = np.load(path / "classes.npy")
+
+        self.n_features_in_ = self.meta["n_features"]
+        self.feature_bits = self.meta["feature_bits"]
+        if self.meta["feature_names"]:
+            self.feature_names_in_ = np.array(self.meta["feature_names"], dtype=object)
+
+    def predict_proba(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"Expected {self.n_features_in_} features, got shape {X.shape}"
+            )
+
+        out = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        _forest_proba(
+            X,
+            self.nodes,
+            self.leaf_index,
+            self.leaf_proba,
+            self.roots,
+            self.depths,
+            self.feature_bits,
+            out
+        )
+        return out
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def load_compiled_forest(model_path, mmap_mode=None):
+    # Compiled forest for model_path, or None when there is none, it is
+    # older than the pickle, or numba is not installed (the pure-Python
+    # kernel is far slower than sklearn)
+    forest_path = compiled_forest_path(model_path)
+    meta_path = forest_path / "meta.json"
+
+    if numba is None or not meta_path.exists():
+        return None
+    if meta_path.stat().st_mtime < Path(model_path).stat().st_mtime:
+        return None
+
+    return CompiledForest(forest_path, mmap_mode=mmap_mode)
+
+
+def main():
+    model_path = Path("data/models/rf_lulc_model.pkl")
+    out_dir = compile_forest(joblib.load(model_path), compiled_forest_path(model_path))
+    print("Compiled forest saved to:", out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from config import BLOCK_SIZE
+from blocks import iter_windows
+from cog import output_profile, finalize_cog
+
+
+# =========================
+# Halo block engine
+# =========================
+# Runs neighbourhood operations on a single-band raster one window at a
+# time. Each window is read with `halo` extra pixels on every side
+# (pixels beyond the raster read as nodata), and the operations shrink
+# the block back to the window. An op is (fn, halo): fn(block) returns
+# the block minus `halo` pixels per side, and must map nodata to nodata.
+# With the halo covering every op's reach, the output is identical to
+# running the ops over the whole raster, with memory bounded by the
+# window size.
+def read_halo(src, window, halo, fill):
+    out = np.full(
+        (window.height + 2 * halo, window.width + 2 * halo), fill, dtype=src.dtypes[0]
+    )
+
+    row0 = max(0, window.row_off - halo)
+    col0 = max(0, window.col_off - halo)
+    row1 = min(src.height, window.row_off + window.height + halo)
+    col1 = min(src.width, window.col_off + window.width + halo)
+
+    r = row0 - (window.row_off - halo)
+    c = col0 - (window.col_off - halo)
+    out[r:r + row1 - row0, c:c + col1 - col0] = src.read(
+        1, window=Window(col0, row0, col1 - col0, row1 - row0)
+    )
+    return out
+
+
+def apply_ops(ops, block):
+    for fn, _ in ops:
+        block = fn(block)
+    return block
+
+
+# =========================
+# Process-pool workers
+# =========================
+# As in infer_lulc: each worker opens the raster once and reads its own
+# windows, so only windows and result blocks cross the process boundary.
+_worker = {}
+
+
+def _init_worker(src_path, ops):
+    _worker["src"] = rasterio.open(src_path)
+    _worker["ops"] = ops
+
+
+def _run_window(window, halo, fill):
+    block = read_halo(_worker["src"], window, halo, fill)
+    return apply_ops(_worker["ops"], block)
+
+
+def process_raster(src_path, dst_path, ops, workers=1, block_size=BLOCK_SIZE,
+                   resampling="nearest"):
+    halo = sum(op_halo for _, op_halo in ops)
+
+    with rasterio.open(src_path) as src:
+        fill = src.nodata if src.nodata is not None else 0
+        profile = output_profile(src.meta)
+
+        with rasterio.open(dst_path, "w", **profile) as dst:
+            windows = iter_windows(src.width, src.height, block_size)
+
+            if workers <= 1:
+                for window in windows:
+                    block = read_halo(src, window, halo, fill)
+                    dst.write(apply_ops(ops, block), 1, window=window)
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(src_path, ops)
+                ) as pool:
+                    # Bounded number of windows in flight, written back in
+                    # window order
+                    pending = deque()
+                    for window in windows:
+                        pending.append(
+                            (window, pool.submit(_run_window, window, halo, fill))
+                        )
+                        if len(pending) >= 4 * workers:
+                            window, future = pending.popleft()
+                            dst.write(future.result(), 1, window=window)
+
+                    while pending:
+                        window, future = pending.popleft()
+                        dst.write(future.result(), 1, window=window)
+
+    finalize_cog(dst_path, resampling=resampling)
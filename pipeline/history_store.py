@@ -0,0 +1,130 @@
+import json
+import os
+from contextlib import ExitStack
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from config import PROCESSED_DIR, YEARS, HISTORY_CHUNK_SIZE
+from profiling import profiled, add_pixels
+
+HISTORY_DIR = PROCESSED_DIR / "timeseries" / "history"
+HISTORY_PATH = HISTORY_DIR / "history.npy"
+HISTORY_META_PATH = HISTORY_DIR / "history.json"
+
+# One record per pixel per year, packed (5 bytes)
+RECORD_DTYPE = np.dtype([("class", "u1"), ("confidence", "<f4")])
+
+
+# =========================
+# Chunked history store
+# =========================
+# Array of shape (chunk_rows, chunk_cols, C, C, n_years): the pixels of a
+# C × C chunk are stored together, and each pixel's records for all years
+# are adjacent, so a pixel's whole time series is one contiguous
+# n_years * 5 byte read from the memory-mapped file. Edge chunks are
+# padded with class 0 (nodata).
+def _prediction_paths(year):
+    pred_dir = PROCESSED_DIR / "predictions"
+    return pred_dir / f"lulc_{year}.tif", pred_dir / f"confidence_{year}.tif"
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _sources(years):
+    return {
+        str(year): [_signature(path) for path in _prediction_paths(year)]
+        for year in years
+    }
+
+
+@profiled
+def build_history_store(years=YEARS, chunk_size=HISTORY_CHUNK_SIZE):
+    years = sorted(years)
+    sources = _sources(years)
+
+    if HISTORY_META_PATH.exists() and HISTORY_PATH.exists():
+        with open(HISTORY_META_PATH) as f:
+            meta = json.load(f)
+        if meta["sources"] == sources and meta["chunk_size"] == chunk_size:
+            print("History store up to date")
+            return
+
+    print(f"\nBuilding pixel history store for {years}...")
+    HISTORY_DIR.mkdir(parents=True, exist_ok=True)
+
+    with ExitStack() as stack:
+        srcs = []
+        for year in years:
+            lulc_path, conf_path = _prediction_paths(year)
+            srcs.append((
+                stack.enter_context(rasterio.open(lulc_path)),
+                stack.enter_context(rasterio.open(conf_path))
+            ))
+
+        ref = srcs[0][0]
+        for lulc_src, conf_src in srcs:
+            for src in (lulc_src, conf_src):
+                if src.shape != ref.shape or src.transform != ref.transform:
+                    raise ValueError(f"{src.name} is not on the {ref.name} grid")
+
+        height, width = ref.height, ref.width
+        chunk_rows = -(-height // chunk_size)
+        chunk_cols = -(-width // chunk_size)
+        add_pixels(width * height * len(years))
+
+        meta = {
+            "years": years,
+            "chunk_size": chunk_size,
+            "width": width,
+            "height": height,
+            "transform": list(ref.transform)[:6],
+            "crs": ref.crs.to_string(),
+            "record": [[name, RECORD_DTYPE[name].str] for name in RECORD_DTYPE.names],
+            "sources": sources,
+        }
+
+        tmp_path = HISTORY_PATH.with_name("history.tmp.npy")
+        store = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=RECORD_DTYPE,
+            shape=(chunk_rows, chunk_cols, chunk_size, chunk_size, len(years))
+        )
+
+        # One strip of chunks at a time: read every year's rows once and
+        # interleave them into the chunk layout
+        strip = np.zeros((chunk_size, chunk_cols * chunk_size, len(years)), dtype=RECORD_DTYPE)
+        for chunk_row in range(chunk_rows):
+            row = chunk_row * chunk_size
+            rows = min(chunk_size, height - row)
+            window = Window(0, row, width, rows)
+
+            strip[:] = 0
+            for k, (lulc_src, conf_src) in enumerate(srcs):
+                strip["class"][:rows, :width, k] = lulc_src.read(1, window=window)
+                strip["confidence"][:rows, :width, k] = conf_src.read(1, window=window)
+
+            store[chunk_row] = strip.reshape(
+                chunk_size, chunk_cols, chunk_size, len(years)
+            ).transpose(1, 0, 2, 3)
+
+        store.flush()
+        del store
+
+    # Metadata first, then the array: readers reload when the array changes
+    with open(HISTORY_META_PATH, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, HISTORY_PATH)
+
+    print(f"History store saved: {HISTORY_PATH} ({chunk_rows} x {chunk_cols} chunks)")
+
+
+def main():
+    build_history_store()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,112 @@
 import numpy as np
 import rasterio
-import joblib
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-from config import PROCESSED_DIR
+from config import (
+    PROCESSED_DIR,
+    INFERENCE_WORKERS,
+    INFERENCE_BATCH_WINDOWS,
+    FEATURES,
+    YEARS
+)
+from profiling import profiled, add_pixels
+from cog import output_profile, finalize_cog
+from model_registry import load_model
+from features import FeatureBuffer
 import warnings
 warnings.filterwarnings(
     "ignore",
     message="X does not have valid feature names"
 )
 
-def infer_year(year):
+
+def predict_window(rf, bands, nodata, features):
+    rows, cols = bands.shape[1:]
+
+    lulc_block = np.zeros((rows, cols), dtype=np.uint8)
+    conf_block = np.zeros((rows, cols), dtype=np.float32)
+
+    # -------------------------
+    # Valid pixel mask
+    # -------------------------
+    valid = ~np.isnan(bands).any(axis=0)
+
+    if nodata is not None:
+        valid &= (bands[0] != nodata)
+
+    # Empty window → zeros
+    if not valid.any():
+        return lulc_block, conf_block
+
+    # -------------------------
+    # Feature extraction
+    # -------------------------
+    X = features.compute(bands, valid)
+
+    # -------------------------
+    # Prediction
+    # -------------------------
+    probs = rf.predict_proba(X)
+    preds = rf.classes_[np.argmax(probs, axis=1)]
+    confs = np.max(probs, axis=1)
+
+    lulc_block[valid] = preds.astype(np.uint8)
+    conf_block[valid] = confs.astype(np.float32)
+
+    return lulc_block, conf_block
+
+
+# =========================
+# Process-pool workers
+# =========================
+# Each worker loads the model and opens the raster once (initializer),
+# then reads and predicts its own windows so only windows and result
+# blocks cross the process boundary.
+_worker = {}
+
+
+def _init_worker(model_path, landsat_path):
+    _worker["rf"] = load_model(model_path)
+    _worker["src"] = rasterio.open(landsat_path)
+    _worker["features"] = FeatureBuffer(FEATURES)
+
+
+def _predict_batch(windows):
+    src = _worker["src"]
+    results = []
+    for window in windows:
+        bands = src.read(window=window).astype(np.float32)
+        results.append(
+            predict_window(_worker["rf"], bands, src.nodata, _worker["features"])
+        )
+    return results
+
+
+def _batched(windows, batch_size):
+    batch = []
+    for _, window in windows:
+        batch.append(window)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_batch(lulc_dst, conf_dst, batch, future):
+    for window, (lulc_block, conf_block) in zip(batch, future.result()):
+        lulc_dst.write(lulc_block, 1, window=window)
+        conf_dst.write(conf_block, 1, window=window)
+
+
+@profiled
+def infer_year(year, workers=None, batch_size=None):
+    workers = workers or INFERENCE_WORKERS
+    batch_size = batch_size or INFERENCE_BATCH_WINDOWS
+
     print(f"\nRunning inference for {year}...")
 
     # =========================
@@ -25,22 +121,26 @@ def infer_year(year):
     lulc_out = out_dir / f"lulc_{year}.tif"
     conf_out = out_dir / f"confidence_{year}.tif"
 
-    # =========================
-    # Load model
-    # =========================
-    rf = joblib.load(model_path)
+    # The model must have been trained on the configured feature columns
+    trained_on = list(getattr(load_model(model_path), "feature_names_in_", FEATURES))
+    if trained_on != FEATURES:
+        raise ValueError(
+            f"Model was trained on {trained_on}, config FEATURES is {FEATURES}; retrain the model"
+        )
+
+    start = time.perf_counter()
 
     # =========================
     # Open Landsat raster
     # =========================
     with rasterio.open(landsat_path) as src:
-        meta = src.meta.copy()
         nodata = src.nodata
+        n_pixels = src.width * src.height
+        add_pixels(n_pixels)
 
         # Output metadata
-        meta.update(count=1, dtype="uint8", nodata=0)
-        conf_meta = meta.copy()
-        conf_meta.update(dtype="float32")
+        meta = output_profile(src.meta, count=1, dtype="uint8", nodata=0)
+        conf_meta = output_profile(src.meta, count=1, dtype="float32", nodata=0)
 
         with rasterio.open(lulc_out, "w", **meta) as lulc_dst, \
              rasterio.open(conf_out, "w", **conf_meta) as conf_dst:
@@ -48,73 +148,49 @@ def infer_year(year):
             # =========================
             # Window-wise inference
             # =========================
-            for _, window in src.block_windows(1):
-                bands = src.read(window=window).astype(np.float32)
-                rows, cols = bands.shape[1:]
-
-                # -------------------------
-                # Valid pixel mask
-                # -------------------------
-                valid = ~np.isnan(bands).any(axis=0)
-
-                if nodata is not None:
-                    valid &= (bands[0] != nodata)
-
-                # Empty window → write zeros
-                if not valid.any():
-                    lulc_dst.write(
-                        np.zeros((rows, cols), dtype=np.uint8),
-                        1,
-                        window=window
-                    )
-                    conf_dst.write(
-                        np.zeros((rows, cols), dtype=np.float32),
-                        1,
-                        window=window
-                    )
-                    continue
-
-                # -------------------------
-                # Feature extraction
-                # -------------------------
-                blue, green, red, nir = bands
-                ndvi = (nir - red) / (nir + red + 1e-6)
-
-                X = np.stack(
-                    [
-                        blue[valid],
-                        green[valid],
-                        red[valid],
-                        nir[valid],
-                        ndvi[valid]
-                    ],
-                    axis=1
-                )
-
-                # -------------------------
-                # Prediction
-                # -------------------------
-                probs = rf.predict_proba(X)
-                preds = rf.classes_[np.argmax(probs, axis=1)]
-                confs = np.max(probs, axis=1)
-
-                # -------------------------
-                # Write outputs
-                # -------------------------
-                lulc_block = np.zeros((rows, cols), dtype=np.uint8)
-                conf_block = np.zeros((rows, cols), dtype=np.float32)
-
-                lulc_block[valid] = preds.astype(np.uint8)
-                conf_block[valid] = confs.astype(np.float32)
-
-                lulc_dst.write(lulc_block, 1, window=window)
-                conf_dst.write(conf_block, 1, window=window)
+            if workers <= 1:
+                rf = load_model(model_path)
+                features = FeatureBuffer(FEATURES)
+
+                for _, window in src.block_windows(1):
+                    bands = src.read(window=window).astype(np.float32)
+                    lulc_block, conf_block = predict_window(rf, bands, nodata, features)
+
+                    lulc_dst.write(lulc_block, 1, window=window)
+                    conf_dst.write(conf_block, 1, window=window)
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(model_path, landsat_path)
+                ) as pool:
+                    # Keep a bounded number of batches in flight and
+                    # write them back in submission (= window) order
+                    pending = deque()
+                    for batch in _batched(src.block_windows(1), batch_size):
+                        pending.append(
+                            (batch, pool.submit(_predict_batch, batch))
+                        )
+                        if len(pending) >= 2 * workers:
+                            _write_batch(lulc_dst, conf_dst, *pending.popleft())
+
+                    while pending:
+                        _write_batch(lulc_dst, conf_dst, *pending.popleft())
+
+    finalize_cog(lulc_out)
+    finalize_cog(conf_out, resampling="average")
+
+    elapsed = time.perf_counter() - start
 
     print(f"Saved outputs for {year}:")
     print(f"  - {lulc_out}")
     print(f"  - {conf_out}")
+    print(
+        f"  Throughput: {n_pixels / 1e6 / elapsed:.2f} MP/s "
+        f"({workers} worker{'s' if workers > 1 else ''}, {elapsed:.1f}s)"
+    )
 
 
 if __name__ == "__main__":
-    infer_year(2018)
-    infer_year(2023)
+    for year in YEARS:
+        infer_year(year)
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+import joblib
+from pathlib import Path
+
+from forest_compiler import load_compiled_forest, compiled_forest_path
+
+# =========================
+# Model registry
+# =========================
+# Loaded models keyed by (path, content hash, compiled forest version), so
+# repeated infer_year() calls in one process reuse the same model, and a
+# retrained pickle or a recompiled forest is picked up without
+# restarting. The compiled forest is memory-mapped: pool workers map the
+# same .npy files and share one physical copy of the tree arrays through
+# the page cache.
+_models = {}
+_hashes = {}
+_lock = threading.Lock()
+
+
+def content_hash(path):
+    # sha256 of the file, recomputed only when its mtime/size change
+    path = Path(path).resolve()
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+
+    cached = _hashes.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+    _hashes[path] = (signature, digest.hexdigest())
+    return _hashes[path][1]
+
+
+def _compiled_signature(model_path):
+    # meta.json is written last by compile_forest, so its mtime/size change
+    # on every (re)compile
+    meta_path = compiled_forest_path(model_path) / "meta.json"
+    try:
+        st = os.stat(meta_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _load(model_path):
+    # Prefer the array-compiled forest written next to the pickle by
+    # train_lulc_rf (same probabilities, no unpickling, faster predict)
+    forest = load_compiled_forest(model_path, mmap_mode="r")
+    if forest is not None:
+        return forest
+
+    # Uncompressed joblib pickles memory-map their numpy arrays
+    rf = joblib.load(model_path, mmap_mode="r")
+    # Threaded tree evaluation sums class probabilities in whatever order
+    # the threads finish, which can flip argmax ties between runs. Predict
+    # single-threaded and get parallelism from the worker pool instead.
+    if hasattr(rf, "n_jobs"):
+        rf.n_jobs = 1
+    return rf
+
+
+def load_model(model_path):
+    key = (
+        str(Path(model_path).resolve()),
+        content_hash(model_path),
+        _compiled_signature(model_path)
+    )
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            # Drop older versions of the same model
+            for old_key in [k for k in _models if k[0] == key[0]]:
+                del _models[old_key]
+            model = _models[key] = _load(model_path)
+
+    return model
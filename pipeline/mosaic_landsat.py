@@ -1,19 +1,226 @@
 from pathlib import Path
+from contextlib import ExitStack
+from xml.etree import ElementTree as ET
 import rasterio
 import numpy as np
 from rasterio.merge import merge
+from rasterio.transform import Affine
+from rasterio.windows import Window, from_bounds
 
-from config import PROCESSED_DIR
+from config import PROCESSED_DIR, BLOCK_SIZE, MOSAIC_MODE, YEARS
+from profiling import profiled, add_pixels
+from blocks import iter_windows
+from cog import output_profile, finalize_cog
+
+
+# =========================
+# Output grid + footprint index
+# =========================
+def mosaic_grid(srcs):
+    # Union of the scene bounds on the first scene's pixel grid
+    # (the same grid rasterio.merge produces)
+    first = srcs[0]
+    res_x, res_y = first.res
+
+    west = min(src.bounds.left for src in srcs)
+    south = min(src.bounds.bottom for src in srcs)
+    east = max(src.bounds.right for src in srcs)
+    north = max(src.bounds.top for src in srcs)
+
+    transform = Affine.translation(west, north) * Affine.scale(res_x, -res_y)
+    width = int(round((east - west) / res_x))
+    height = int(round((north - south) / res_y))
+
+    return transform, width, height
+
+
+def scene_windows(srcs, transform):
+    # Window each scene covers on the output grid. Streaming only copies
+    # whole pixels, so scenes must share CRS, resolution and pixel grid.
+    first = srcs[0]
+    windows = []
+
+    for src in srcs:
+        if src.crs != first.crs or src.res != first.res:
+            raise ValueError(
+                f"{Path(src.name).name} does not share the CRS/resolution of "
+                f"{Path(first.name).name}; use mode='merge' to resample"
+            )
+
+        window = from_bounds(*src.bounds, transform=transform)
+        offsets = (window.col_off, window.row_off)
+        if any(abs(v - round(v)) > 1e-6 for v in offsets):
+            raise ValueError(
+                f"{Path(src.name).name} is not aligned to the mosaic pixel grid; "
+                f"use mode='merge' to resample"
+            )
+
+        windows.append(Window(
+            int(round(window.col_off)),
+            int(round(window.row_off)),
+            src.width,
+            src.height
+        ))
+
+    return windows
+
+
+def footprint_index(windows, block_size=BLOCK_SIZE):
+    # {(block_row, block_col): [scene indices in priority order]}
+    index = {}
+    for i, w in enumerate(windows):
+        for block_row in range(w.row_off // block_size,
+                               (w.row_off + w.height - 1) // block_size + 1):
+            for block_col in range(w.col_off // block_size,
+                                   (w.col_off + w.width - 1) // block_size + 1):
+                index.setdefault((block_row, block_col), []).append(i)
+    return index
+
+
+def scenes_for_window(index, window, block_size=BLOCK_SIZE):
+    # Scenes indexed under any block the (unaligned) window touches
+    ids = set()
+    for block_row in range(window.row_off // block_size,
+                           (window.row_off + window.height - 1) // block_size + 1):
+        for block_col in range(window.col_off // block_size,
+                               (window.col_off + window.width - 1) // block_size + 1):
+            ids.update(index.get((block_row, block_col), []))
+    return sorted(ids)
+
+
+def fill_block(block_window, srcs, windows, scene_ids, count):
+    # method="first": earlier scenes win, later scenes only fill NaNs
+    out = np.full(
+        (count, block_window.height, block_window.width),
+        np.nan,
+        dtype=np.float32
+    )
+
+    for i in scene_ids:
+        try:
+            overlap = block_window.intersection(windows[i])
+        except rasterio.errors.WindowError:
+            continue
+
+        src_window = Window(
+            overlap.col_off - windows[i].col_off,
+            overlap.row_off - windows[i].row_off,
+            overlap.width,
+            overlap.height
+        )
+        data = srcs[i].read(window=src_window).astype(np.float32)
+
+        r0 = overlap.row_off - block_window.row_off
+        c0 = overlap.col_off - block_window.col_off
+        dst = out[:, r0:r0 + overlap.height, c0:c0 + overlap.width]
+
+        np.copyto(dst, data, where=np.isnan(dst) & ~np.isnan(data))
+
+    return out
+
+
+# =========================
+# Virtual mosaic
+# =========================
+def write_vrt(raster_files, srcs, windows, transform, width, height, out_path):
+    root = ET.Element(
+        "VRTDataset",
+        rasterXSize=str(width),
+        rasterYSize=str(height)
+    )
+    ET.SubElement(root, "SRS").text = srcs[0].crs.to_wkt()
+    ET.SubElement(root, "GeoTransform").text = ", ".join(
+        repr(v) for v in transform.to_gdal()
+    )
+
+    for band in range(1, srcs[0].count + 1):
+        band_el = ET.SubElement(
+            root, "VRTRasterBand", dataType="Float32", band=str(band)
+        )
+        ET.SubElement(band_el, "NoDataValue").text = "nan"
+
+        # GDAL paints sources in order, so list them last-to-first to
+        # keep the "first scene wins" priority of the windowed mosaic
+        for fp, src, w in reversed(list(zip(raster_files, srcs, windows))):
+            source = ET.SubElement(band_el, "ComplexSource")
+            ET.SubElement(
+                source, "SourceFilename", relativeToVRT="1"
+            ).text = Path(fp).relative_to(out_path.parent).as_posix()
+            ET.SubElement(source, "SourceBand").text = str(band)
+            ET.SubElement(
+                source, "SrcRect",
+                xOff="0", yOff="0", xSize=str(src.width), ySize=str(src.height)
+            )
+            ET.SubElement(
+                source, "DstRect",
+                xOff=str(w.col_off), yOff=str(w.row_off),
+                xSize=str(w.width), ySize=str(w.height)
+            )
+            ET.SubElement(source, "NODATA").text = "nan"
+
+    ET.ElementTree(root).write(out_path)
+
+
+@profiled
+def mosaic_year(year, mode=None):
+    mode = mode or MOSAIC_MODE
 
-def mosaic_year(year):
     input_dir = PROCESSED_DIR / str(year) / "cloud_masked"
     output_dir = PROCESSED_DIR / str(year)
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    raster_files = list(input_dir.glob("*.tif"))
+    raster_files = sorted(input_dir.glob("*.tif"))
     if not raster_files:
         raise ValueError(f"No cloud-masked rasters found for {year}")
 
+    if mode == "merge":
+        return merge_year(year, raster_files, output_dir)
+    if mode not in ("windowed", "vrt"):
+        raise ValueError(f"Unknown mosaic mode: {mode}")
+
+    print(f"\nMosaicking {len(raster_files)} scenes for {year} ({mode})...")
+
+    with ExitStack() as stack:
+        srcs = [stack.enter_context(rasterio.open(fp)) for fp in raster_files]
+
+        transform, width, height = mosaic_grid(srcs)
+        windows = scene_windows(srcs, transform)
+
+        if mode == "vrt":
+            out_path = output_dir / f"landsat_{year}_mosaic.vrt"
+            write_vrt(raster_files, srcs, windows, transform, width, height, out_path)
+            print(f"Saved virtual mosaic: {out_path.name}")
+            return out_path
+
+        index = footprint_index(windows)
+        add_pixels(width * height)
+
+        meta = output_profile(srcs[0].meta, **{
+            "height": height,
+            "width": width,
+            "transform": transform,
+            "count": srcs[0].count,
+            "nodata": np.nan,
+            "dtype": "float32"
+        })
+
+        out_path = output_dir / f"landsat_{year}_mosaic.tif"
+
+        with rasterio.open(out_path, "w", **meta) as dst:
+            for window in iter_windows(width, height):
+                block = fill_block(
+                    window, srcs, windows,
+                    scenes_for_window(index, window), srcs[0].count
+                )
+                dst.write(block, window=window)
+
+    finalize_cog(out_path, resampling="average")
+
+    print(f"Saved SAFE mosaic: {out_path.name}")
+    return out_path
+
+
+def merge_year(year, raster_files, output_dir):
     print(f"\nSafely mosaicking {len(raster_files)} scenes for {year}...")
 
     src_files = []
@@ -30,8 +237,7 @@ def mosaic_year(year):
         method="first"
     )
 
-    meta = src_files[0].meta.copy()
-    meta.update({
+    meta = output_profile(src_files[0].meta, **{
         "height": mosaic.shape[1],
         "width": mosaic.shape[2],
         "transform": transform,
@@ -48,11 +254,14 @@ def mosaic_year(year):
     for src in src_files:
         src.close()
 
+    finalize_cog(out_path, resampling="average")
+
     print(f"Saved SAFE mosaic: {out_path.name}")
+    return out_path
 
 def main():
-    mosaic_year(2018)
-    mosaic_year(2023)
+    for year in YEARS:
+        mosaic_year(year)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,194 @@
+from functools import partial
+
+import numpy as np
+import rasterio
+from scipy import ndimage
+
+from config import (
+    PROCESSED_DIR,
+    YEARS,
+    MAJORITY_RADIUS,
+    MMU_PIXELS,
+    CHANGE_OPENING_RADIUS,
+    POSTPROCESS_WORKERS
+)
+from profiling import profiled, add_pixels
+from halo_blocks import process_raster
+
+
+# =========================
+# Neighbourhood operations
+# =========================
+# Class rasters (uint8, 0 = nodata). Each op takes a block with its halo
+# and returns the block minus the halo; nodata pixels stay nodata and
+# pixels beyond the raster edge count as nodata.
+def _core(block, halo):
+    return block[halo:block.shape[0] - halo, halo:block.shape[1] - halo]
+
+
+def box_sum(values, radius):
+    # Sum over every (2r+1) x (2r+1) neighbourhood that fits in values;
+    # the result is `radius` pixels smaller on each side
+    k = 2 * radius + 1
+    s = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.int32)
+    s[1:, 1:] = values.cumsum(axis=0, dtype=np.int32).cumsum(axis=1)
+    return s[k:, k:] - s[:-k, k:] - s[k:, :-k] + s[:-k, :-k]
+
+
+def majority_filter(block, radius):
+    # Most frequent class in each (2r+1)² neighbourhood, nodata ignored.
+    # Ties keep the centre class if it is among them, else the lowest code.
+    core = _core(block, radius)
+    codes = np.unique(block)
+    codes = codes[codes != 0]
+    if not codes.size:
+        return core.copy()
+
+    counts = np.stack([box_sum(block == code, radius) for code in codes])
+    best = counts.max(axis=0)
+
+    centre = np.searchsorted(codes, core).clip(max=codes.size - 1)
+    centre_count = np.take_along_axis(counts, centre[None], axis=0)[0]
+
+    out = np.where(centre_count == best, core, codes[counts.argmax(axis=0)])
+    out[core == 0] = 0
+    return out.astype(block.dtype)
+
+
+def sieve_filter(block, min_pixels):
+    # Minimum mapping unit: 4-connected patches of one class smaller than
+    # min_pixels take the class they share the most edges with (nodata
+    # neighbours ignored, ties → lowest code). Neighbours are read from
+    # the input, so the result does not depend on patch order. A patch
+    # that reaches the block edge extends past the halo (min_pixels) and
+    # so is never small.
+    labels = np.zeros(block.shape, dtype=np.int32)
+    n_patches = 0
+    for code in np.unique(block):
+        if code == 0:
+            continue
+        patch, n = ndimage.label(block == code)
+        labels[patch > 0] = patch[patch > 0] + n_patches
+        n_patches += n
+
+    small = np.bincount(labels.ravel(), minlength=n_patches + 1) < min_pixels
+    small[0] = False
+    small[np.concatenate([labels[0], labels[-1], labels[:, 0], labels[:, -1]])] = False
+
+    # (patch, neighbour class) for every edge between a small patch and
+    # another patch, in all four directions
+    keys = []
+    for a, b in (
+        ((slice(1, None), slice(None)), (slice(None, -1), slice(None))),
+        ((slice(None, -1), slice(None)), (slice(1, None), slice(None))),
+        ((slice(None), slice(1, None)), (slice(None), slice(None, -1))),
+        ((slice(None), slice(None, -1)), (slice(None), slice(1, None))),
+    ):
+        own, other = labels[a], labels[b]
+        values = block[b]
+        edge = small[own] & (own != other) & (values != 0)
+        keys.append(own[edge].astype(np.int64) * 256 + values[edge])
+
+    core = _core(block, min_pixels)
+    keys = np.concatenate(keys)
+    if not keys.size:
+        return core.copy()
+
+    keys, counts = np.unique(keys, return_counts=True)
+    patch, value = keys // 256, keys % 256
+
+    # First entry per patch after sorting by (patch, most edges, lowest code)
+    order = np.lexsort((value, -counts, patch))
+    patch, value = patch[order], value[order]
+    first = np.r_[True, patch[1:] != patch[:-1]]
+
+    replacement = np.zeros(n_patches + 1, dtype=block.dtype)
+    replaced = np.zeros(n_patches + 1, dtype=bool)
+    replacement[patch[first]] = value[first]
+    replaced[patch[first]] = True
+
+    out = core.copy()
+    core_labels = _core(labels, min_pixels)
+    hit = replaced[core_labels]
+    out[hit] = replacement[core_labels[hit]]
+    return out
+
+
+def open_changes(block, radius):
+    # Morphological opening of the changed pixels of a change map
+    # (i*10 + j, i != j) with a (2r+1)² square: change patches narrower
+    # than the square revert to no change (i*10 + i)
+    changed = (block != 0) & (block // 10 != block % 10)
+    eroded = box_sum(changed, radius) == (2 * radius + 1) ** 2
+    opened = box_sum(eroded, radius) > 0
+
+    core = _core(block, 2 * radius)
+    out = core.copy()
+    revert = _core(changed, 2 * radius) & ~opened
+    out[revert] = (core[revert] // 10) * 11
+    return out
+
+
+# (fn, halo) pairs for halo_blocks.process_raster
+def majority(radius):
+    return partial(majority_filter, radius=radius), radius
+
+
+def sieve(min_pixels):
+    return partial(sieve_filter, min_pixels=min_pixels), min_pixels
+
+
+def opening(radius):
+    return partial(open_changes, radius=radius), 2 * radius
+
+
+def lulc_ops():
+    ops = []
+    if MAJORITY_RADIUS:
+        ops.append(majority(MAJORITY_RADIUS))
+    if MMU_PIXELS > 1:
+        ops.append(sieve(MMU_PIXELS))
+    return ops
+
+
+def change_ops():
+    ops = []
+    if CHANGE_OPENING_RADIUS:
+        ops.append(opening(CHANGE_OPENING_RADIUS))
+    if MMU_PIXELS > 1:
+        ops.append(sieve(MMU_PIXELS))
+    return ops
+
+
+# =========================
+# Stages
+# =========================
+def _run(src_path, dst_path, ops, workers):
+    with rasterio.open(src_path) as src:
+        add_pixels(src.width * src.height)
+    process_raster(src_path, dst_path, ops, workers or POSTPROCESS_WORKERS)
+    print(f"Saved: {dst_path}")
+
+
+@profiled
+def smooth_lulc(year, workers=None):
+    print(f"\nSmoothing LULC map for {year}...")
+    pred_dir = PROCESSED_DIR / "predictions"
+    _run(pred_dir / f"lulc_{year}.tif", pred_dir / f"lulc_{year}_smoothed.tif", lulc_ops(), workers)
+
+
+@profiled
+def clean_change_map(workers=None):
+    print("\nCleaning change map...")
+    change_dir = PROCESSED_DIR / "change"
+    _run(change_dir / "change_map.tif", change_dir / "change_map_clean.tif", change_ops(), workers)
+
+
+def main():
+    for year in YEARS:
+        smooth_lulc(year)
+    clean_change_map()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from contextlib import ExitStack
+from types import SimpleNamespace
+import numpy as np
+import rasterio
+
+from config import RAW_LANDSAT_DIR, PROCESSED_DIR, BLOCK_SIZE, YEARS
+from profiling import profiled, add_pixels
+from cog import output_profile, finalize_cog
+from aoi_index import aoi_index, OUTSIDE, PARTIAL
+from cloud_mask_landsat import MaskedScene
+from mosaic_landsat import (
+    mosaic_grid,
+    scene_windows,
+    footprint_index,
+    scenes_for_window,
+    fill_block
+)
+
+
+# =========================
+# Lazy mask → mosaic → clip
+# =========================
+# Produces the same landsat_{year}_tirupati.tif as running
+# cloud_mask_landsat, mosaic_landsat and clip_to_aoi in sequence, but pulls
+# raw band blocks straight through masking, mosaicking and the AOI clip
+# and writes only the clipped raster.
+def open_chain(year, stack, block_size=BLOCK_SIZE):
+    # Scenes, mosaic footprints and AOI index of one year, for
+    # clipped_block(). Scene files stay open on `stack`.
+    year_dir = RAW_LANDSAT_DIR / str(year)
+    scene_dirs = sorted(d for d in year_dir.iterdir() if d.is_dir())
+    if not scene_dirs:
+        raise ValueError(f"No Landsat scenes found for {year}")
+
+    scenes = [MaskedScene(d, stack) for d in scene_dirs]
+
+    # -------------------------
+    # Mosaic grid + footprints
+    # -------------------------
+    transform, width, height = mosaic_grid(scenes)
+    windows = scene_windows(scenes, transform)
+
+    # -------------------------
+    # AOI crop window + block flags (cached per mosaic grid)
+    # -------------------------
+    grid = SimpleNamespace(transform=transform, width=width, height=height)
+    aoi = aoi_index(grid, scenes[0].crs, block_size)
+
+    meta = output_profile(scenes[0].meta, **{
+        "height": aoi.height,
+        "width": aoi.width,
+        "transform": aoi.transform,
+        "nodata": np.nan,
+        "dtype": "float32"
+    })
+
+    return SimpleNamespace(
+        scenes=scenes,
+        windows=windows,
+        index=footprint_index(windows, block_size),
+        aoi=aoi,
+        meta=meta,
+        block_size=block_size
+    )
+
+
+def clipped_block(chain, window, flag):
+    # One block of the clipped raster; window is on the AOI crop grid
+    if flag == OUTSIDE:
+        return np.full(
+            (chain.meta["count"], window.height, window.width),
+            np.nan,
+            dtype=np.float32
+        )
+
+    # Same block on the mosaic grid
+    mosaic_window = chain.aoi.source_window(window)
+    block = fill_block(
+        mosaic_window,
+        chain.scenes,
+        chain.windows,
+        scenes_for_window(chain.index, mosaic_window, chain.block_size),
+        chain.meta["count"]
+    )
+    if flag == PARTIAL:
+        block[:, ~chain.aoi.mask(window)] = np.nan
+
+    return block
+
+
+@profiled
+def chain_year(year, block_size=BLOCK_SIZE):
+    print(f"\nPreprocessing {year}: mask → mosaic → clip (streamed)...")
+
+    out_path = PROCESSED_DIR / str(year) / f"landsat_{year}_tirupati.tif"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with ExitStack() as stack:
+        chain = open_chain(year, stack, block_size)
+        add_pixels(chain.aoi.width * chain.aoi.height)
+
+        with rasterio.open(out_path, "w", **chain.meta) as dst:
+            for window, flag in chain.aoi.windows():
+                dst.write(clipped_block(chain, window, flag), window=window)
+
+    finalize_cog(out_path, resampling="average")
+
+    print(f"Saved clipped raster: {out_path.name}")
+    return out_path
+
+
+def main():
+    for year in YEARS:
+        chain_year(year)
+
+
+if __name__ == "__main__":
+    main()
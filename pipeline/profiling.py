@@ -0,0 +1,170 @@
+import atexit
+import functools
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from config import PROCESSED_DIR
+
+RUNS_DIR = PROCESSED_DIR / "runs"
+
+# =========================
+# Stage profiling
+# =========================
+# Every @profiled stage call appends one record to this process's run;
+# the run is written to data/processed/runs/<timestamp>-<pid>.json when
+# the process exits. Nested stages (chain_year inside timeseries, ...)
+# are recorded individually, with `parent` naming the enclosing stage.
+#
+# Linux gives exact per-stage numbers: bytes from /proc/self/io and peak
+# RSS from VmHWM, which is reset at the start of each stage. Elsewhere
+# bytes are omitted and peak RSS is the process high-water mark so far.
+# CPU time includes worker processes the stage has joined; their I/O does
+# not appear in /proc/self/io.
+_run = {
+    "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    "argv": sys.argv,
+    "host": platform.node(),
+    "stages": []
+}
+_active = []
+
+
+def _io_counters():
+    # (bytes read, bytes written) through read/write syscalls, page cache
+    # hits included
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except OSError:
+        return None
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb(since_reset):
+    if since_reset:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    scale = 1 if sys.platform == "darwin" else 1024
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return peak * scale / 2 ** 20
+
+
+def _cpu_seconds():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _jsonable(value):
+    return value if isinstance(value, (int, float, str, bool, type(None))) else str(value)
+
+
+def add_pixels(n):
+    # Credit n processed pixels to the innermost running stage
+    if _active:
+        _active[-1]["pixels"] += int(n)
+
+
+def profiled(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        record = {
+            "stage": fn.__name__,
+            "args": [_jsonable(a) for a in args],
+            "parent": _active[-1]["stage"] if _active else None,
+            "pixels": 0,
+        }
+        io_start = _io_counters()
+        cpu_start = _cpu_seconds()
+        reset = _reset_peak_rss()
+        start = time.perf_counter()
+
+        _active.append(record)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _active.pop()
+
+            record["wall_s"] = round(time.perf_counter() - start, 4)
+            record["cpu_s"] = round(_cpu_seconds() - cpu_start, 4)
+
+            io_end = _io_counters()
+            if io_start is not None and io_end is not None:
+                record["bytes_read"] = io_end[0] - io_start[0]
+                record["bytes_written"] = io_end[1] - io_start[1]
+
+            # A nested stage resets VmHWM, so fold its peak back in
+            peak = max(_peak_rss_mb(reset), record.pop("_child_peak_rss_mb", 0))
+            record["peak_rss_mb"] = round(peak, 1)
+            if _active:
+                parent = _active[-1]
+                parent["_child_peak_rss_mb"] = max(parent.get("_child_peak_rss_mb", 0), peak)
+
+            if record["pixels"] and record["wall_s"] > 0:
+                record["mp_per_s"] = round(record["pixels"] / 1e6 / record["wall_s"], 3)
+
+            _run["stages"].append(record)
+    return wrapper
+
+
+def init_worker():
+    # Pool initializer: a forked worker starts with a copy of the parent's
+    # records and open stages, which are the parent's to report
+    del _run["stages"][:]
+    del _active[:]
+
+
+def take_stages():
+    # This process's stage records since init_worker() or the last call,
+    # removed from its run. Pool workers never run atexit, so they hand
+    # their records to the parent.
+    stages = _run["stages"][:]
+    del _run["stages"][:]
+    return stages
+
+
+def add_stages(stages):
+    # Records from a worker process, nested under the running stage
+    parent = _active[-1]["stage"] if _active else None
+    for record in stages:
+        if record["parent"] is None:
+            record["parent"] = parent
+        _run["stages"].append(record)
+
+
+def write_report(path=None):
+    if not _run["stages"]:
+        return None
+
+    path = path or RUNS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    _run["finished"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    with open(path, "w") as f:
+        json.dump(_run, f, indent=2)
+
+    print("Run profile saved:", path)
+    return path
+
+
+atexit.register(write_report)
@@ -0,0 +1,462 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+from types import SimpleNamespace
+from uuid import uuid4
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+from rasterio.windows import Window, transform as window_transform
+
+from config import (
+    PROCESSED_DIR,
+    YEARS,
+    YEAR_T1,
+    YEAR_T2,
+    FEATURES,
+    BLOCK_SIZE,
+    STATS_BLOCK_SIZE,
+    TILE_SIZE
+)
+from profiling import profiled, add_pixels
+from blocks import iter_windows
+from cog import output_profile, finalize_cog
+from aoi_index import OUTSIDE
+from preprocess_chain import open_chain, clipped_block
+from infer_lulc import predict_window
+from model_registry import load_model
+from features import FeatureBuffer
+from compute_change import (
+    NUM_CODES,
+    change_block,
+    accumulate_counts,
+    accumulate_block_counts,
+    write_count_table,
+    write_summary,
+    write_transition_matrix
+)
+from work_queue import WorkQueue, run_worker
+
+TILED_DIR = PROCESSED_DIR / "tiled"
+QUEUE_DIR = TILED_DIR / "queue"
+TILE_OUT_DIR = TILED_DIR / "tiles"
+PLAN_PATH = TILED_DIR / "plan.json"
+
+MODEL_PATH = Path("data/models/rf_lulc_model.pkl")
+
+
+# =========================
+# Tiled execution
+# =========================
+# The AOI crop grid is cut into TILE_SIZE tiles, each an independent job:
+# for every year mask → mosaic → clip → infer, then the change products
+# and the count histograms of the tile, all streamed block by block and
+# written under data/processed/tiled/tiles/<tile>/. Workers on one node or
+# on several nodes sharing data/ pull tiles from the work queue; stitch()
+# then merges the tile rasters into the usual outputs and sums the counts
+# into the usual stats files. Tiles fully outside the AOI are not queued.
+def tile_products(years, year_from, year_to):
+    # {tile raster name: (stitched output path, nodata, resampling)}
+    products = {}
+    for year in years:
+        products[f"landsat_{year}"] = (
+            PROCESSED_DIR / str(year) / f"landsat_{year}_tirupati.tif", np.nan, "average"
+        )
+        products[f"lulc_{year}"] = (
+            PROCESSED_DIR / "predictions" / f"lulc_{year}.tif", 0, "nearest"
+        )
+        products[f"confidence_{year}"] = (
+            PROCESSED_DIR / "predictions" / f"confidence_{year}.tif", 0, "average"
+        )
+    products["change_map"] = (PROCESSED_DIR / "change" / "change_map.tif", 0, "nearest")
+    products["transition_probability"] = (
+        PROCESSED_DIR / "change" / "transition_probability.tif", 0, "average"
+    )
+    return products
+
+
+@profiled
+def plan_tiles(years=YEARS, tile_size=TILE_SIZE, block_size=BLOCK_SIZE):
+    years = sorted(years)
+    if YEAR_T1 not in years or YEAR_T2 not in years:
+        raise ValueError(f"Tiled runs need the change years {YEAR_T1} and {YEAR_T2} in {years}")
+    if tile_size % block_size or block_size % STATS_BLOCK_SIZE:
+        raise ValueError("BLOCK_SIZE must divide TILE_SIZE and STATS_BLOCK_SIZE must divide BLOCK_SIZE")
+
+    # Every year must clip to the same grid, as compute_change requires
+    with ExitStack() as stack:
+        chains = {year: open_chain(year, stack, block_size) for year in years}
+    ref = chains[years[0]]
+    for year, chain in chains.items():
+        if (chain.aoi.width, chain.aoi.height) != (ref.aoi.width, ref.aoi.height) \
+                or chain.aoi.transform != ref.aoi.transform:
+            raise ValueError(f"The {year} AOI grid differs from {years[0]}; tiled runs need one grid")
+
+    queue = WorkQueue(QUEUE_DIR)
+    queue.reset()
+    shutil.rmtree(TILE_OUT_DIR, ignore_errors=True)
+
+    tiles, skipped = [], []
+    blocks_per_tile = tile_size // block_size
+    for tile in iter_windows(ref.aoi.width, ref.aoi.height, tile_size):
+        tile_row, tile_col = tile.row_off // tile_size, tile.col_off // tile_size
+        entry = {
+            "id": f"r{tile_row:03d}c{tile_col:03d}",
+            "window": [tile.col_off, tile.row_off, tile.width, tile.height],
+        }
+
+        flags = ref.aoi.flags[
+            tile_row * blocks_per_tile:(tile_row + 1) * blocks_per_tile,
+            tile_col * blocks_per_tile:(tile_col + 1) * blocks_per_tile
+        ]
+        if (flags == OUTSIDE).all():
+            skipped.append(entry)
+            continue
+
+        queue.submit(entry["id"], {**entry, "years": years, "block_size": block_size})
+        tiles.append(entry)
+
+    plan = {
+        "years": years,
+        "year_from": YEAR_T1,
+        "year_to": YEAR_T2,
+        "tile_size": tile_size,
+        "block_size": block_size,
+        "width": ref.aoi.width,
+        "height": ref.aoi.height,
+        "transform": list(ref.aoi.transform)[:6],
+        "crs": ref.meta["crs"].to_string(),
+        "tiles": tiles,
+        "skipped": skipped,
+    }
+    TILED_DIR.mkdir(parents=True, exist_ok=True)
+    with open(PLAN_PATH, "w") as f:
+        json.dump(plan, f, indent=2)
+
+    print(
+        f"Planned {len(tiles)} tiles of {tile_size} px over {ref.aoi.width} x {ref.aoi.height} "
+        f"({len(skipped)} outside the AOI skipped)"
+    )
+    return plan
+
+
+# =========================
+# Tile job
+# =========================
+# Model and feature buffer are loaded once per worker process
+_worker = {}
+
+
+def _model():
+    if "rf" not in _worker:
+        rf = load_model(MODEL_PATH)
+        trained_on = list(getattr(rf, "feature_names_in_", FEATURES))
+        if trained_on != FEATURES:
+            raise ValueError(
+                f"Model was trained on {trained_on}, config FEATURES is {FEATURES}; retrain the model"
+            )
+        _worker["rf"] = rf
+        _worker["features"] = FeatureBuffer(FEATURES)
+    return _worker["rf"], _worker["features"]
+
+
+def _write_tile(tile, years, block_size, out_dir, tmp):
+    year_from, year_to = YEAR_T1, YEAR_T2
+
+    rf, features = _model()
+    add_pixels(tile.width * tile.height * len(years))
+
+    class_counts_from = np.zeros(256, dtype=np.int64)
+    class_counts_to = np.zeros(256, dtype=np.int64)
+    pair_counts = np.zeros(NUM_CODES * NUM_CODES, dtype=np.int64)
+    block_counts = np.zeros(
+        (
+            -(-tile.height // STATS_BLOCK_SIZE),
+            -(-tile.width // STATS_BLOCK_SIZE),
+            NUM_CODES * NUM_CODES
+        ),
+        dtype=np.int64
+    )
+
+    with ExitStack() as stack:
+        chains = {year: open_chain(year, stack, block_size) for year in years}
+        aoi = chains[years[0]].aoi
+
+        # Tile rasters, written under temporary names
+        grid = {
+            "width": tile.width,
+            "height": tile.height,
+            "transform": window_transform(tile, aoi.transform),
+        }
+        meta = chains[years[0]].meta
+        profiles = {
+            "change_map": output_profile(meta, count=1, dtype="uint8", nodata=0, **grid),
+            "transition_probability": output_profile(meta, count=1, dtype="float32", nodata=0.0, **grid),
+        }
+        for year in years:
+            profiles[f"landsat_{year}"] = output_profile(chains[year].meta, **grid)
+            profiles[f"lulc_{year}"] = output_profile(meta, count=1, dtype="uint8", nodata=0, **grid)
+            profiles[f"confidence_{year}"] = output_profile(meta, count=1, dtype="float32", nodata=0, **grid)
+
+        dsts = {
+            name: stack.enter_context(rasterio.open(out_dir / f"{name}.tif{tmp}", "w", **profile))
+            for name, profile in profiles.items()
+        }
+
+        for local in iter_windows(tile.width, tile.height, block_size):
+            # Same block on the AOI crop grid
+            window = Window(
+                local.col_off + tile.col_off,
+                local.row_off + tile.row_off,
+                local.width,
+                local.height
+            )
+            flag = aoi.flag(window)
+
+            predictions = {}
+            for year in years:
+                bands = clipped_block(chains[year], window, flag)
+                dsts[f"landsat_{year}"].write(bands, window=local)
+
+                lulc_block, conf_block = predict_window(rf, bands, np.nan, features)
+                dsts[f"lulc_{year}"].write(lulc_block, 1, window=local)
+                dsts[f"confidence_{year}"].write(conf_block, 1, window=local)
+                predictions[year] = (lulc_block, conf_block)
+
+            a, p = predictions[year_from]
+            b, q = predictions[year_to]
+            transition, prob = change_block(a, b, p, q)
+            dsts["change_map"].write(transition, 1, window=local)
+            dsts["transition_probability"].write(prob, 1, window=local)
+
+            accumulate_counts(a, b, class_counts_from, class_counts_to, pair_counts)
+            accumulate_block_counts(a, b, local, block_counts)
+
+    for name in profiles:
+        os.replace(out_dir / f"{name}.tif{tmp}", out_dir / f"{name}.tif")
+
+    # Counts last: a tile with stats.npz has all its rasters
+    with open(out_dir / f"stats.npz{tmp}", "wb") as f:
+        np.savez(
+            f,
+            class_counts_from=class_counts_from,
+            class_counts_to=class_counts_to,
+            pair_counts=pair_counts,
+            block_counts=block_counts
+        )
+    os.replace(out_dir / f"stats.npz{tmp}", out_dir / "stats.npz")
+
+
+@profiled
+def run_tile(payload):
+    tile = Window(*payload["window"])
+    years = payload["years"]
+
+    out_dir = TILE_OUT_DIR / payload["id"]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Unique across nodes: the same tile can run on two workers at once
+    # after a lease expires, and container pids repeat
+    tmp = f".{uuid4().hex}.tmp"
+
+    try:
+        _write_tile(tile, years, payload["block_size"], out_dir, tmp)
+    except BaseException:
+        # Drop this attempt's partial files
+        for path in out_dir.glob(f"*{tmp}"):
+            path.unlink(missing_ok=True)
+        raise
+
+    return {"pixels": tile.width * tile.height}
+
+
+# =========================
+# Stitch / reduce
+# =========================
+def _stitch_raster(path, tiles, skipped, plan, nodata, resampling, name):
+    transform = Affine(*plan["transform"])
+    block_size = plan["block_size"]
+
+    with rasterio.open(TILE_OUT_DIR / tiles[0]["id"] / f"{name}.tif") as first:
+        profile = output_profile(first.meta, **{
+            "width": plan["width"],
+            "height": plan["height"],
+            "transform": transform,
+        })
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(path, "w", **profile) as dst:
+        for entry in tiles:
+            tile = Window(*entry["window"])
+            with rasterio.open(TILE_OUT_DIR / entry["id"] / f"{name}.tif") as src:
+                for local in iter_windows(tile.width, tile.height, block_size):
+                    dst.write(
+                        src.read(window=local),
+                        window=Window(
+                            local.col_off + tile.col_off,
+                            local.row_off + tile.row_off,
+                            local.width,
+                            local.height
+                        )
+                    )
+
+        for entry in skipped:
+            tile = Window(*entry["window"])
+            for local in iter_windows(tile.width, tile.height, block_size):
+                dst.write(
+                    np.full((dst.count, local.height, local.width), nodata, dtype=dst.dtypes[0]),
+                    window=Window(
+                        local.col_off + tile.col_off,
+                        local.row_off + tile.row_off,
+                        local.width,
+                        local.height
+                    )
+                )
+
+    finalize_cog(path, resampling=resampling)
+
+
+@profiled
+def stitch():
+    with open(PLAN_PATH) as f:
+        plan = json.load(f)
+
+    tiles, skipped = plan["tiles"], plan["skipped"]
+    done = {job["id"] for job in WorkQueue(QUEUE_DIR).jobs("done")}
+    missing = [entry["id"] for entry in tiles if entry["id"] not in done]
+    if missing:
+        raise RuntimeError(
+            f"{len(missing)} of {len(tiles)} tiles are not done ({', '.join(missing[:5])}...); "
+            f"run more workers or check {QUEUE_DIR / 'failed'}"
+        )
+    if not tiles:
+        raise ValueError("No tiles intersect the AOI")
+
+    print(f"\nStitching {len(tiles)} tiles...")
+    add_pixels(plan["width"] * plan["height"])
+
+    # -------------------------
+    # Rasters
+    # -------------------------
+    products = tile_products(plan["years"], plan["year_from"], plan["year_to"])
+    for name, (path, nodata, resampling) in products.items():
+        _stitch_raster(path, tiles, skipped, plan, nodata, resampling, name)
+        print(f"  - {path}")
+
+    # -------------------------
+    # Counts
+    # -------------------------
+    class_counts_from = np.zeros(256, dtype=np.int64)
+    class_counts_to = np.zeros(256, dtype=np.int64)
+    pair_counts = np.zeros(NUM_CODES * NUM_CODES, dtype=np.int64)
+    block_counts = np.zeros(
+        (
+            -(-plan["height"] // STATS_BLOCK_SIZE),
+            -(-plan["width"] // STATS_BLOCK_SIZE),
+            NUM_CODES * NUM_CODES
+        ),
+        dtype=np.int64
+    )
+
+    def cells(tile):
+        return (
+            slice(tile.row_off // STATS_BLOCK_SIZE, -(-(tile.row_off + tile.height) // STATS_BLOCK_SIZE)),
+            slice(tile.col_off // STATS_BLOCK_SIZE, -(-(tile.col_off + tile.width) // STATS_BLOCK_SIZE))
+        )
+
+    for entry in tiles:
+        with np.load(TILE_OUT_DIR / entry["id"] / "stats.npz") as stats:
+            class_counts_from += stats["class_counts_from"]
+            class_counts_to += stats["class_counts_to"]
+            pair_counts += stats["pair_counts"]
+            block_counts[cells(Window(*entry["window"]))] += stats["block_counts"]
+
+    # Skipped tiles are all nodata (code 0), as a full run would count them
+    for entry in skipped:
+        tile = Window(*entry["window"])
+        class_counts_from[0] += tile.width * tile.height
+        class_counts_to[0] += tile.width * tile.height
+        block_counts[cells(tile) + (0,)] += STATS_BLOCK_SIZE * STATS_BLOCK_SIZE
+
+    stats_dir = PROCESSED_DIR / "stats"
+    stats_dir.mkdir(parents=True, exist_ok=True)
+    grid = SimpleNamespace(
+        width=plan["width"], height=plan["height"], transform=Affine(*plan["transform"])
+    )
+
+    write_count_table(
+        block_counts,
+        grid,
+        stats_dir / "transition_counts_sat.npy",
+        stats_dir / "transition_counts_sat.json",
+        plan["year_from"],
+        plan["year_to"]
+    )
+    write_summary(
+        class_counts_from, class_counts_to, stats_dir / "summary_stats.json",
+        plan["year_from"], plan["year_to"]
+    )
+    write_transition_matrix(
+        pair_counts, stats_dir / "transition_matrix.csv", stats_dir / "transition_matrix.json"
+    )
+    print(f"  - stats in {stats_dir}")
+
+
+# =========================
+# CLI
+# =========================
+def work():
+    return run_worker(WorkQueue(QUEUE_DIR), run_tile)
+
+
+def start_workers(processes):
+    # Local worker processes (each its own interpreter and run profile)
+    procs = [
+        subprocess.Popen([sys.executable, __file__, "worker"])
+        for _ in range(processes)
+    ]
+    failed = sum(proc.wait() != 0 for proc in procs)
+    if failed:
+        raise RuntimeError(f"{failed} of {processes} workers exited with an error")
+
+
+def print_status():
+    counts = WorkQueue(QUEUE_DIR).counts()
+    print(", ".join(f"{state} {n}" for state, n in counts.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline as independent tiles on a shared work queue"
+    )
+    parser.add_argument(
+        "command", choices=["run", "plan", "worker", "stitch", "status"],
+        help="run = plan + local workers + stitch; on other nodes start `worker`"
+    )
+    parser.add_argument("--workers", "-n", type=int, default=1,
+                        help="worker processes to start on this node (run, worker)")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE)
+    args = parser.parse_args()
+
+    if args.command in ("run", "plan"):
+        plan_tiles(tile_size=args.tile_size)
+
+    if args.command == "run" or (args.command == "worker" and args.workers > 1):
+        start_workers(args.workers)
+    elif args.command == "worker":
+        work()
+
+    if args.command in ("run", "stitch"):
+        stitch()
+
+    if args.command == "status":
+        print_status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+import json
+import os
+import numpy as np
+import rasterio
+from pathlib import Path
+from rasterio.windows import Window
+
+from config import PROCESSED_DIR, YEARS, LULC_CLASSES, PIXEL_AREA_KM2, BLOCK_SIZE
+from profiling import profiled, add_pixels
+from history_store import build_history_store
+
+# Class codes 0..NUM_CODES-1 (0 = nodata), one fixed-width bit field per
+# year: year k of the sorted year list occupies bits [k*BITS, (k+1)*BITS)
+NUM_CODES = max(LULC_CLASSES) + 1
+BITS_PER_YEAR = (NUM_CODES - 1).bit_length()
+FIELD_MASK = (1 << BITS_PER_YEAR) - 1
+
+STORE_DIR = PROCESSED_DIR / "timeseries"
+STORE_PATH = STORE_DIR / "trajectories.npy"
+META_PATH = STORE_DIR / "trajectories.json"
+
+MODEL_PATH = Path("data/models/rf_lulc_model.pkl")
+
+
+# =========================
+# Packed trajectory store
+# =========================
+# One integer per pixel holding its class in every ingested year
+# (uint8 for up to 2 years, uint16 up to 5, uint32 up to 10, uint64 up
+# to 21), on the grid of the prediction rasters.
+def store_dtype(n_years):
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_years * BITS_PER_YEAR <= np.dtype(dtype).itemsize * 8:
+            return np.dtype(dtype)
+    raise ValueError(f"{n_years} years do not fit in a 64-bit trajectory")
+
+
+def load_store():
+    # (meta, memory-mapped trajectories), or (None, None) before the
+    # first ingest
+    if not META_PATH.exists() or not STORE_PATH.exists():
+        return None, None
+    with open(META_PATH) as f:
+        meta = json.load(f)
+    return meta, np.load(STORE_PATH, mmap_mode="r")
+
+
+def _signature(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def decode(trajectories, meta, year):
+    # Class codes of `year` from packed trajectories (any shape)
+    dtype = np.dtype(meta["dtype"]).type
+    shift = meta["years"].index(year) * BITS_PER_YEAR
+    return ((trajectories >> dtype(shift)) & dtype(FIELD_MASK)).astype(np.uint8)
+
+
+@profiled
+def ingest_year(year):
+    # Add (or replace) one year's classes. The store is rewritten under a
+    # temporary name with the fields of the other years moved to their
+    # slots in the new sorted year list, then renamed into place.
+    lulc_path = PROCESSED_DIR / "predictions" / f"lulc_{year}.tif"
+    meta, old = load_store()
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+
+    with rasterio.open(lulc_path) as src:
+        if meta is None:
+            meta = {
+                "years": [],
+                "width": src.width,
+                "height": src.height,
+                "transform": list(src.transform)[:6],
+                "crs": src.crs.to_string(),
+                "bits_per_year": BITS_PER_YEAR,
+                "sources": {},
+            }
+        elif (meta["width"], meta["height"]) != (src.width, src.height) \
+                or list(src.transform)[:6] != meta["transform"]:
+            raise ValueError(f"{lulc_path.name} is not on the trajectory store grid")
+
+        old_years = [y for y in meta["years"] if y != year]
+        years = sorted(old_years + [year])
+        dtype = store_dtype(len(years))
+        add_pixels(src.width * src.height)
+
+        tmp_path = STORE_PATH.with_name("trajectories.tmp.npy")
+        new = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=dtype, shape=(src.height, src.width)
+        )
+
+        for row in range(0, src.height, BLOCK_SIZE):
+            rows = min(BLOCK_SIZE, src.height - row)
+            block = np.zeros((rows, src.width), dtype=dtype)
+
+            for y in old_years:
+                codes = decode(old[row:row + rows], meta, y).astype(dtype)
+                block |= codes << dtype.type(years.index(y) * BITS_PER_YEAR)
+
+            codes = src.read(1, window=Window(0, row, src.width, rows))
+            codes = np.where(codes < NUM_CODES, codes, 0).astype(dtype)
+            block |= codes << dtype.type(years.index(year) * BITS_PER_YEAR)
+
+            new[row:row + rows] = block
+
+        new.flush()
+        del new
+
+    del old
+    os.replace(tmp_path, STORE_PATH)
+
+    meta["years"] = years
+    meta["dtype"] = dtype.name
+    meta["sources"][str(year)] = _signature(lulc_path)
+    with open(META_PATH, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"Ingested {year} into {STORE_PATH.name} ({len(years)} years, {dtype.name})")
+
+
+# =========================
+# Incremental update
+# =========================
+def _older(path, *sources):
+    return any(
+        s.exists() and path.stat().st_mtime < s.stat().st_mtime for s in sources
+    )
+
+
+@profiled
+def update_year(year):
+    # Run only the stages whose outputs are missing or stale for `year`
+    landsat_path = PROCESSED_DIR / str(year) / f"landsat_{year}_tirupati.tif"
+    lulc_path = PROCESSED_DIR / "predictions" / f"lulc_{year}.tif"
+
+    if not landsat_path.exists():
+        from preprocess_chain import chain_year
+        chain_year(year)
+
+    if not lulc_path.exists() or _older(lulc_path, landsat_path, MODEL_PATH):
+        from infer_lulc import infer_year
+        infer_year(year)
+
+    meta, _ = load_store()
+    if meta is None or meta["sources"].get(str(year)) != _signature(lulc_path):
+        ingest_year(year)
+    else:
+        print(f"{year}: up to date")
+
+
+# =========================
+# Statistics (one pass over the store)
+# =========================
+def trajectory_histogram(meta, trajectories):
+    # Distinct packed trajectories and their pixel counts. Everything
+    # below is derived from this, without touching the per-year rasters.
+    values, counts = [], []
+    for row in range(0, meta["height"], BLOCK_SIZE):
+        v, c = np.unique(trajectories[row:row + BLOCK_SIZE], return_counts=True)
+        values.append(v)
+        counts.append(c)
+
+    values, inverse = np.unique(np.concatenate(values), return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate(counts)).astype(np.int64)
+    return values, counts
+
+
+def class_counts(meta, histogram, year):
+    values, counts = histogram
+    return np.bincount(decode(values, meta, year), weights=counts, minlength=NUM_CODES)
+
+
+def pair_counts(meta, histogram, year_from, year_to):
+    # (NUM_CODES, NUM_CODES) pixel counts of from → to, row/col 0 = nodata
+    values, counts = histogram
+    a = decode(values, meta, year_from).astype(np.intp)
+    b = decode(values, meta, year_to).astype(np.intp)
+    pairs = np.bincount(a * NUM_CODES + b, weights=counts, minlength=NUM_CODES ** 2)
+    return pairs.astype(np.int64).reshape(NUM_CODES, NUM_CODES)
+
+
+def _class_name(code):
+    return LULC_CLASSES.get(int(code), "No Data")
+
+
+@profiled
+def write_trajectory_stats(out_json, top=50):
+    meta, trajectories = load_store()
+    if meta is None:
+        raise FileNotFoundError("No trajectory store; ingest a year first")
+
+    years = meta["years"]
+    histogram = trajectory_histogram(meta, trajectories)
+
+    stats = {"years": years, "class_area_sq_km": {}, "transitions": {}}
+
+    for year in years:
+        counts = class_counts(meta, histogram, year)
+        stats["class_area_sq_km"][str(year)] = {
+            name: round(counts[cls] * PIXEL_AREA_KM2, 3)
+            for cls, name in LULC_CLASSES.items()
+        }
+
+    # Consecutive years plus first → last, {from_class: {to_class: sq_km}}
+    pairs = list(zip(years, years[1:]))
+    if len(years) > 2:
+        pairs.append((years[0], years[-1]))
+    for year_from, year_to in pairs:
+        matrix = pair_counts(meta, histogram, year_from, year_to)
+        stats["transitions"][f"{year_from}-{year_to}"] = {
+            from_name: {
+                to_name: round(matrix[i, j] * PIXEL_AREA_KM2, 3)
+                for j, to_name in LULC_CLASSES.items()
+            }
+            for i, from_name in LULC_CLASSES.items()
+        }
+
+    # Most common trajectories with at least one classified year
+    values, counts = histogram
+    order = np.argsort(counts)[::-1]
+    stats["trajectories"] = []
+    for i in order:
+        path = [int(decode(values[i], meta, year)) for year in years]
+        if not any(path):
+            continue
+        stats["trajectories"].append({
+            "classes": [_class_name(code) for code in path],
+            "pixels": int(counts[i]),
+            "area_sq_km": round(counts[i] * PIXEL_AREA_KM2, 3)
+        })
+        if len(stats["trajectories"]) == top:
+            break
+
+    with open(out_json, "w") as f:
+        json.dump(stats, f, indent=2)
+
+    return stats
+
+
+def main():
+    for year in YEARS:
+        update_year(year)
+
+    out_json = PROCESSED_DIR / "stats" / "trajectory_stats.json"
+    out_json.parent.mkdir(parents=True, exist_ok=True)
+    write_trajectory_stats(out_json)
+    print("Trajectory statistics saved:", out_json)
+
+    # Per-pixel class/confidence series served by /api/pixel/history
+    build_history_store(YEARS)
+
+
+if __name__ == "__main__":
+    main()
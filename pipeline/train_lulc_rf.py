@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import joblib
 from pathlib import Path
@@ -6,14 +7,18 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, confusion_matrix
 
-from config import PROCESSED_DIR, RANDOM_FOREST_PARAMS
+from config import PROCESSED_DIR, RANDOM_FOREST_PARAMS, FEATURES
+from profiling import profiled, add_pixels
+from forest_compiler import compile_forest, compiled_forest_path
 
 
+@profiled
 def train_rf():
     # =========================
     # Paths
     # =========================
-    data_path = PROCESSED_DIR / "training" / "training_pixels_2018.csv"
+    data_path = PROCESSED_DIR / "training" / "training_pixels_2018.npz"
+    legacy_csv_path = data_path.with_suffix(".csv")
     model_dir = Path("data/models")
     model_dir.mkdir(parents=True, exist_ok=True)
 
@@ -24,7 +29,11 @@ def train_rf():
     # Load data
     # =========================
     print("Loading training data...")
-    df = pd.read_csv(data_path)
+    if data_path.exists():
+        with np.load(data_path) as data:
+            df = pd.DataFrame({name: data[name] for name in data.files})
+    else:
+        df = pd.read_csv(legacy_csv_path)
 
     # =========================
     # MEMORY SAFETY: Subsample
@@ -38,7 +47,8 @@ def train_rf():
     # =========================
     # Features & labels
     # =========================
-    X = df[["blue", "green", "red", "nir", "ndvi"]]
+    X = df[FEATURES]
+    add_pixels(len(df))
     y = df["label"]
 
     # =========================
@@ -75,6 +85,7 @@ def train_rf():
     # Save outputs
     # =========================
     joblib.dump(rf, model_path)
+    forest_path = compile_forest(rf, compiled_forest_path(model_path))
 
     with open(metrics_path, "w") as f:
         f.write("Classification Report:\n")
@@ -83,6 +94,7 @@ def train_rf():
         f.write(str(cm))
 
     print("\nModel saved to:", model_path)
+    print("Compiled forest saved to:", forest_path)
     print("Metrics saved to:", metrics_path)
 
 
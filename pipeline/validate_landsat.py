@@ -1,7 +1,8 @@
 from pathlib import Path
 import rasterio
 
-from config import RAW_LANDSAT_DIR
+from config import RAW_LANDSAT_DIR, YEARS
+from profiling import profiled
 
 REQUIRED_KEYWORDS = ["B2", "B3", "B4", "B5", "QA_PIXEL"]
 
@@ -28,6 +29,7 @@ def validate_scene(scene_dir):
         print(f"    CRS: {src.crs}")
         print(f"    Resolution: {src.res}")
 
+@profiled
 def validate_year(year):
     year_dir = RAW_LANDSAT_DIR / str(year)
     print(f"\nValidating Landsat data for {year}...")
@@ -48,5 +50,5 @@ def validate_year(year):
     print(f"\nValidation passed for {year}.")
 
 if __name__ == "__main__":
-    validate_year(2018)
-    validate_year(2023)
+    for year in YEARS:
+        validate_year(year)
@@ -0,0 +1,176 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import traceback
+from pathlib import Path
+from uuid import uuid4
+
+from config import TILE_LEASE_SECONDS, TILE_MAX_ATTEMPTS
+
+STATES = ("pending", "running", "done", "failed")
+
+# Idle workers re-check the queue this often (seconds)
+POLL_SECONDS = 5
+
+
+# =========================
+# Directory work queue
+# =========================
+# Each job is a JSON file that moves pending/ → running/ → done/ (or
+# failed/) by rename. A rename is atomic, so exactly one worker claims a
+# job, and the queue works for worker processes on one node or on several
+# nodes that mount the same directory. A running job's file is touched as
+# a heartbeat; a job whose heartbeat is older than `lease` seconds (its
+# worker died) is put back in pending/.
+class WorkQueue:
+    def __init__(self, root, lease=TILE_LEASE_SECONDS, max_attempts=TILE_MAX_ATTEMPTS):
+        self.root = Path(root)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        for state in STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def _path(self, state, job_id):
+        return self.root / state / f"{job_id}.json"
+
+    def _write(self, path, job):
+        # uuid, not pid: workers on other nodes may share the pid
+        tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _remove(self, state, job_id):
+        try:
+            os.remove(self._path(state, job_id))
+        except FileNotFoundError:
+            pass
+
+    def reset(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        for state in STATES:
+            (self.root / state).mkdir(parents=True, exist_ok=True)
+
+    def submit(self, job_id, payload):
+        self._write(
+            self._path("pending", job_id),
+            {"id": job_id, "payload": payload, "attempts": 0}
+        )
+
+    def claim(self, worker):
+        for path in sorted((self.root / "pending").glob("*.json")):
+            target = self._path("running", path.stem)
+            try:
+                os.rename(path, target)
+            except FileNotFoundError:
+                # Claimed by another worker
+                continue
+            os.utime(target)
+
+            with open(target) as f:
+                job = json.load(f)
+
+            if job["attempts"] >= self.max_attempts:
+                self._write(self._path("failed", job["id"]), job)
+                self._remove("running", job["id"])
+                continue
+
+            job["attempts"] += 1
+            job["worker"] = worker
+            self._write(target, job)
+            return job
+        return None
+
+    def heartbeat(self, job_id):
+        try:
+            os.utime(self._path("running", job_id))
+        except FileNotFoundError:
+            pass
+
+    def complete(self, job, result):
+        job["result"] = result
+        self._write(self._path("done", job["id"]), job)
+        self._remove("running", job["id"])
+        # Requeued while this worker was presumed dead: nothing left to do
+        self._remove("pending", job["id"])
+
+    def fail(self, job, error):
+        job["error"] = error
+        state = "pending" if job["attempts"] < self.max_attempts else "failed"
+        self._write(self._path(state, job["id"]), job)
+        self._remove("running", job["id"])
+
+    def requeue_stale(self):
+        now = time.time()
+        requeued = 0
+        for path in (self.root / "running").glob("*.json"):
+            try:
+                if now - path.stat().st_mtime <= self.lease:
+                    continue
+                os.rename(path, self._path("pending", path.stem))
+            except FileNotFoundError:
+                continue
+            requeued += 1
+        return requeued
+
+    def jobs(self, state):
+        for path in sorted((self.root / state).glob("*.json")):
+            try:
+                with open(path) as f:
+                    yield json.load(f)
+            except FileNotFoundError:
+                continue
+
+    def counts(self):
+        return {
+            state: len(list((self.root / state).glob("*.json")))
+            for state in STATES
+        }
+
+
+def _heartbeat(queue, job_id, stop):
+    while not stop.wait(queue.lease / 4):
+        queue.heartbeat(job_id)
+
+
+def run_worker(queue, handler, worker=None, poll=POLL_SECONDS):
+    # Claim and run jobs until none are pending or running anywhere;
+    # handler(payload) returns a JSON-serialisable result. A failing job
+    # is retried (by any worker) up to the queue's max_attempts.
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    completed = 0
+
+    while True:
+        job = queue.claim(worker)
+        if job is None:
+            counts = queue.counts()
+            if not counts["pending"] and not counts["running"]:
+                break
+            # Other workers still busy: wait for them, or for their jobs
+            # to come back if they died
+            queue.requeue_stale()
+            time.sleep(poll)
+            continue
+
+        stop = threading.Event()
+        beat = threading.Thread(
+            target=_heartbeat, args=(queue, job["id"], stop), daemon=True
+        )
+        beat.start()
+        try:
+            result = handler(job["payload"])
+        except Exception:
+            print(f"[{worker}] {job['id']} failed (attempt {job['attempts']})")
+            queue.fail(job, traceback.format_exc())
+        else:
+            queue.complete(job, result)
+            completed += 1
+            print(f"[{worker}] {job['id']} done")
+        finally:
+            stop.set()
+            beat.join()
+
+    return completed